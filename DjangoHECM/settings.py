@@ -33,6 +33,18 @@ LOGGING = {
             'style': '{',
         },
     },
+    'filters': {
+        # Fraction of records kept per event type (extra={'event': ...}), see myhecmapp.log
+        'sampling': {
+            '()': 'myhecmapp.log.SamplingFilter',
+            'rates': {
+                'input.derived': 0.01,
+                'plf.resolved': 0.01,
+                'quote.recalculate': 0.01,
+                'quote.summary': 1.0,
+            },
+        },
+    },
     'handlers': {
         'console': {
             'level': 'DEBUG',  # Set to DEBUG to see all messages in console
@@ -45,6 +57,12 @@ LOGGING = {
             'filename': os.path.join(LOGS_DIR, 'django.log'),
             'formatter': 'verbose',
         },
+        # Hands records to console and file on a background thread
+        'queued': {
+            'class': 'myhecmapp.log.QueuedHandler',
+            'targets': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['sampling'],
+        },
     },
     'loggers': {
         # Django's built-in loggers
@@ -54,9 +72,10 @@ LOGGING = {
             'propagate': True,
         },
         # Your app's logger - MAKE SURE THIS MATCHES your app name exactly
+        # INFO logs one summary record per quote; DEBUG adds per-stage tracing
         'myhecmapp': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',  # Set to DEBUG to capture all messages
+            'handlers': ['queued'],
+            'level': os.environ.get('HECM_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
     },
@@ -92,6 +111,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so request latency includes the rest of the middleware stack
+    'myhecmapp.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -173,3 +194,33 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Compiled PLF snapshots (see the compile_plf_snapshot management command)
+HECM_PLF_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'data', 'plf_snapshots')
+
+# Seconds between reads of the config versions (HECMConfig.updated_at and plf_version), after which a
+# process reloads configs and rebuilds PLF indexes changed by other processes; None disables them
+HECM_VERSION_CHECK_INTERVAL = 1.0
+
+# Preload the current HECMConfig and PLF index in AppConfig.ready() (set HECM_WARMUP=1 to enable)
+HECM_WARMUP = os.environ.get('HECM_WARMUP') == '1'
+
+# Cache of identical quotes: a bounded in-process LRU, or {'BACKEND': 'django', 'ALIAS': ...}
+HECM_RESULT_CACHE = {
+    'BACKEND': 'lru',
+    'MAX_SIZE': 10000,
+}
+
+# Write-behind audit trail of quotes (saved as HECMInput/HECMResult rows in batches)
+HECM_AUDIT = {
+    'ENABLED': False,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,  # seconds
+    'MAX_QUEUE': 10000,
+}
+
+# Cache-Control max-age of a versioned pricing kit URL, /hecm/calculate/kit/?v=<version> (seconds)
+HECM_QUOTE_MAX_AGE = 31536000
+
+# Clients allowed to scrape the Prometheus metrics at /hecm/metrics/ (per worker process, not aggregated)
+HECM_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
@@ -3,6 +3,7 @@ from .models.config import HECMConfig
 from .models.inputs import HECMInput
 from .models.results import HECMResult
 from .models.tables import PLFTable
+from .services.plf_index import plf_data_changed
 
 @admin.register(HECMConfig)
 class HECMConfigAdmin(admin.ModelAdmin):
@@ -15,12 +16,20 @@ class PLFTableAdmin(admin.ModelAdmin):
     list_filter = ('age', 'interest_rate')
     search_fields = ('age', 'interest_rate')
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        plf_data_changed(obj.config_id)
+
+    def delete_queryset(self, request, queryset):
+        config_ids = set(queryset.values_list('config_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for config_id in config_ids:
+            plf_data_changed(config_id)
+
 @admin.register(HECMInput)
 class HECMInputAdmin(admin.ModelAdmin):
-    # Removed 'created_at' which doesn't exist in your model
-    list_display = ('id', 'home_value', 'age', 'interest_rate', 'existing_mortgage')
-    # Removed 'created_at' from list_filter
-    list_filter = ('age',)
+    list_display = ('id', 'created_at', 'home_value', 'age', 'interest_rate', 'existing_mortgage')
+    list_filter = ('created_at', 'age')
     search_fields = ('home_value', 'age')
 
 @admin.register(HECMResult)
@@ -0,0 +1,33 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db import DatabaseError
+import logging
+import warnings
+
+logger = logging.getLogger('myhecmapp')
+
+
+class MyhecmappConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'myhecmapp'
+
+    def ready(self):
+        # Connect signal handlers
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'HECM_WARMUP', False):
+            self.warm_up()
+
+    def warm_up(self):
+        """Preload the PLF index and current config before the worker accepts traffic"""
+        from .services.warmup import warm_up
+
+        try:
+            # Querying during ready() is deliberate here; the warmup is opt-in
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='Accessing the database during app initialization',
+                                        category=RuntimeWarning)
+                warm_up()
+        except DatabaseError as e:
+            # e.g. running migrate on a fresh database
+            logger.warning(f"Skipping HECM warmup: {str(e)}")
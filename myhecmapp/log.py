@@ -0,0 +1,105 @@
+from logging.handlers import QueueListener
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import threading
+
+
+class QueuedHandler(logging.Handler):
+    """
+    Non-blocking handler that hands records to other handlers on a background thread
+
+    The calling thread only puts the record on a bounded queue; a
+    QueueListener formats it and writes it to the target handlers (e.g.
+    console and file). Records arriving while the queue is full are dropped.
+    A process forked after the listener started (e.g. gunicorn --preload)
+    gets an empty queue and a listener thread of its own.
+
+    Usage in LOGGING['handlers'] (dictConfig configures handlers in name
+    order, so the targets' names must sort before this handler's):
+        'queued': {'class': 'myhecmapp.log.QueuedHandler',
+                   'targets': ['cfg://handlers.console', 'cfg://handlers.file']}
+    """
+
+    def __init__(self, targets=(), maxsize=10000):
+        super().__init__()
+        # Indexing, unlike iterating, resolves the cfg:// references of dictConfig's lists
+        self.targets = [targets[i] for i in range(len(targets))]
+        for target in self.targets:
+            if not isinstance(target, logging.Handler):
+                raise ValueError(f"QueuedHandler targets must be configured handlers, got {target!r}")
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._listener = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start(self):
+        if self._listener is None:
+            atexit.register(self._stop)
+        self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self._listener.start()
+
+    def _stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+
+    def _after_fork(self):
+        """Replace the queue and the listener, whose thread didn't survive the fork"""
+        self._lock = threading.Lock()
+        # Records still queued belong to the parent, which writes them
+        self.queue = queue.Queue(self.queue.maxsize)
+        if self._listener is not None:
+            self._start()
+
+    def prepare(self, record):
+        """Merge args and traceback into the message so the record can cross threads"""
+        message = self.format(record)
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+    def emit(self, record):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._start()
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            # Never block the request thread on logging
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records of each event type
+
+    Records carry their event type in the "event" attribute (passed through
+    extra={'event': ...}); records without one always pass.
+
+    Usage in LOGGING['filters']:
+        'sampling': {'()': 'myhecmapp.log.SamplingFilter', 'rates': {'plf.resolved': 0.01}}
+    """
+
+    def __init__(self, rates=None, default_rate=1.0):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.default_rate = default_rate
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None:
+            return True
+        rate = self.rates.get(event, self.default_rate)
+        return rate >= 1.0 or random.random() < rate
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...services.bench import Workloads, benchmark_environment, compare, measure, seed, summarize
+import django
+import json
+import platform
+import sys
+
+
+class Command(BaseCommand):
+    help = ('Run seeded calculator microbenchmarks against a temporary SQLite database, '
+            'optionally saving a JSON baseline or failing on regressions against one')
+
+    def add_arguments(self, parser):
+        parser.add_argument('workloads', nargs='*', metavar='workload',
+                            help=f'Workloads to run (default: all of {", ".join(Workloads.names)})')
+        parser.add_argument('--iterations', type=int, default=2000, help='Timed operations per workload')
+        parser.add_argument('--warmup', type=int, default=100, help='Untimed operations before timing')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the generated scenarios')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per calculate_many batch')
+        parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline')
+        parser.add_argument('--baseline', metavar='PATH', help='Compare against a saved JSON baseline')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Fail when a median latency regressed by more than this percentage')
+
+    def handle(self, *args, **options):
+        names = options['workloads'] or list(Workloads.names)
+        unknown = sorted(set(names) - set(Workloads.names))
+        if unknown:
+            raise CommandError(f'Unknown workloads: {", ".join(unknown)}')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        results = {}
+        with benchmark_environment() as tmp_dir:
+            config, csv_path = seed(tmp_dir)
+            self.stdout.write(f'Seed {options["seed"]}, {options["iterations"]} iterations per workload')
+            self.stdout.write(f'  {"workload":<26} {"ops/s":>10} {"items/s":>12} '
+                              f'{"p50 us":>10} {"p90 us":>10} {"p99 us":>10}')
+            for name in names:
+                # A fresh generator per workload keeps each one reproducible on its own
+                workloads = Workloads(config, csv_path, options['seed'], options['batch_size'])
+                op, items_per_op = getattr(workloads, name)()
+                samples = measure(op, options['iterations'], options['warmup'])
+                stats = results[name] = summarize(samples, items_per_op)
+                self.stdout.write(
+                    f'  {name:<26} {stats["ops_per_sec"]:10.1f} {stats["items_per_sec"]:12.1f} '
+                    f'{stats["p50"] * 1e6:10.1f} {stats["p90"] * 1e6:10.1f} {stats["p99"] * 1e6:10.1f}')
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump({
+                    'meta': {
+                        'seed': options['seed'],
+                        'iterations': options['iterations'],
+                        'batch_size': options['batch_size'],
+                        'python': sys.version.split()[0],
+                        'django': django.get_version(),
+                        'platform': platform.platform(),
+                    },
+                    'results': results
+                }, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {options["save"]}'))
+
+        if baseline is not None:
+            rows, regressions = compare(results, baseline, options['threshold'])
+            self.stdout.write(f'Median latency against {options["baseline"]}:')
+            for name, previous, current, change in rows:
+                line = f'  {name:<26} {previous * 1e6:10.1f} us -> {current * 1e6:10.1f} us   {change:+6.1f}%'
+                self.stdout.write(self.style.ERROR(line) if name in regressions else line)
+            if regressions:
+                raise CommandError(f'{len(regressions)} workload(s) regressed by more than '
+                                   f'{options["threshold"]:g}%: {", ".join(regressions)}')
+            self.stdout.write(self.style.SUCCESS(f'No regression above {options["threshold"]:g}%'))
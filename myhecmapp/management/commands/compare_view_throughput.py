@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from myhecmapp.services.result_cache import reset_quote_cache
+import asyncio
+import random
+import statistics
+import time
+
+# Django cache used for the database-backed quote cache run (its table is created if missing)
+DATABASE_CACHE_ALIAS = 'hecm_quotes'
+DATABASE_CACHE = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'hecm_quote_cache'}
+
+
+class Command(BaseCommand):
+    help = ('Compare quote throughput of the sync and async calculation views under ASGI at the same '
+            'concurrency, with the configured quote cache and with a database-backed Django cache')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests sent to each view')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the generated scenarios')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        scenarios = [{
+            'home_value': str(rng.randrange(100000, 1500000, 1000)),
+            'age': str(rng.randint(62, 95)),
+            'interest_rate': str(rng.choice(['4.5', '5.0', '5.5', '6.0', '6.5', '7.0'])),
+            'existing_mortgage': str(rng.randrange(0, 200000, 5000))
+        } for _ in range(options['requests'])]
+
+        self.stdout.write(f'{options["requests"]} requests per view, concurrency {options["concurrency"]}')
+        configurations = [
+            ('configured quote cache', {}),
+            ('database quote cache', {
+                'CACHES': {**settings.CACHES, DATABASE_CACHE_ALIAS: DATABASE_CACHE},
+                'HECM_RESULT_CACHE': {'BACKEND': 'django', 'ALIAS': DATABASE_CACHE_ALIAS},
+            }),
+        ]
+        for label, overrides in configurations:
+            # The test client always sends Host: testserver
+            with override_settings(ALLOWED_HOSTS=['testserver'], **overrides):
+                reset_quote_cache()
+                if 'CACHES' in overrides:
+                    call_command('createcachetable', DATABASE_CACHE['LOCATION'], verbosity=0)
+                    caches[DATABASE_CACHE_ALIAS].clear()
+                self.stdout.write(label)
+                for name in ('myhecmapp:calculate', 'myhecmapp:calculate_async'):
+                    url = reverse(name)
+                    elapsed, latencies, errors = asyncio.run(self._drive(url, scenarios, options['concurrency']))
+                    latencies.sort()
+                    self.stdout.write(
+                        f'  {url:<28} {len(latencies) / elapsed:8.1f} req/s   '
+                        f'p50 {statistics.median(latencies) * 1000:7.2f} ms   '
+                        f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.2f} ms   '
+                        f'errors {errors}')
+        reset_quote_cache()
+
+    async def _drive(self, url, scenarios, concurrency):
+        """Send every scenario to url with at most concurrency requests in flight"""
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        # Prime the config and PLF caches outside the measurement
+        await client.post(url, scenarios[0])
+
+        async def send(scenario):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, scenario)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200 or not response.json()['success']:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(scenario) for scenario in scenarios))
+        return time.perf_counter() - started, latencies, errors
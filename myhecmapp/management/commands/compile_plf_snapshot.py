@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from myhecmapp.models.config import HECMConfig
+from myhecmapp.services.plf_index import PLFIndex, invalidate_plf_index
+from myhecmapp.services.plf_snapshot import snapshot_path, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Compile PLF data into memory-mappable binary snapshots, one per HECMConfig'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', type=int, action='append',
+                            help='ID of a HECMConfig to compile (repeatable, defaults to all configs)')
+
+    def handle(self, *args, **options):
+        config_ids = options.get('config')
+
+        configs = HECMConfig.objects.order_by('id')
+        if config_ids:
+            configs = configs.filter(pk__in=config_ids)
+
+        compiled = 0
+        for config in configs:
+            index = PLFIndex.build(config)
+            path = snapshot_path(config.id)
+            version = write_snapshot(index, path)
+            invalidate_plf_index(config.id)
+            compiled += 1
+            self.stdout.write(
+                f'Config {config.id}: {len(index.table)} table entries, {len(index.fallback)} CSV entries '
+                f'-> {path} (version {version})')
+
+        self.stdout.write(self.style.SUCCESS(f'Compiled {compiled} PLF snapshots'))
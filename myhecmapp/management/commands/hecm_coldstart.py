@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter and prints its timings as JSON
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.test import Client
+setup_done = time.perf_counter()
+from myhecmapp.services import calculator
+import_done = time.perf_counter()
+pandas_loaded = 'pandas' in sys.modules
+client = Client(HTTP_HOST='localhost')
+data = {'home_value': '350000', 'age': '70', 'interest_rate': '5.5', 'existing_mortgage': '0'}
+before = time.perf_counter()
+first = client.post('/hecm/calculate/', data)
+first_done = time.perf_counter()
+client.post('/hecm/calculate/', data)
+second_done = time.perf_counter()
+print(json.dumps({
+    'django_setup': setup_done - started,
+    'calculator_import': import_done - setup_done,
+    'first_request': first_done - before,
+    'second_request': second_done - first_done,
+    'pandas_loaded': pandas_loaded,
+    'status': first.status_code,
+}))
+'''
+
+TIMINGS = ('django_setup', 'calculator_import', 'first_request', 'second_request')
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start import and first-request times in fresh interpreters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to start')
+        parser.add_argument('--warmup', action='store_true', help='Enable the AppConfig.ready() warmup (HECM_WARMUP=1)')
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoHECM.settings')
+        env['HECM_WARMUP'] = '1' if options['warmup'] else '0'
+
+        samples = [self._run_probe(env) for _ in range(runs)]
+
+        self.stdout.write(f'Cold start over {runs} runs (warmup {"on" if options["warmup"] else "off"}):')
+        for name in TIMINGS:
+            values = [sample[name] * 1000 for sample in samples]
+            self.stdout.write(f'  {name:<18} median {statistics.median(values):8.1f} ms   '
+                              f'min {min(values):8.1f} ms   max {max(values):8.1f} ms')
+        pandas_runs = sum(sample['pandas_loaded'] for sample in samples)
+        self.stdout.write(f'  pandas imported on the quote path in {pandas_runs}/{runs} runs')
+
+    def _run_probe(self, env):
+        """Run the probe in a fresh interpreter and return its timings"""
+        result = subprocess.run([sys.executable, '-c', PROBE], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f'Cold-start probe failed:\n{result.stderr}')
+        # Logging may write to stdout too; the timings are on the last line
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if sample['status'] != 200:
+            raise CommandError(f'Probe request failed with status {sample["status"]}')
+        return sample
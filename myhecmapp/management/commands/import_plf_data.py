@@ -2,10 +2,25 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from myhecmapp.models.tables import PLFTable
 from myhecmapp.models.config import HECMConfig
+from myhecmapp.services.plf_index import PLFIndex, plf_data_changed
+from myhecmapp.services.plf_snapshot import snapshot_path, write_snapshot
+import hashlib
 import os
 import pandas as pd
+import time
 from decimal import Decimal
 
+# Decimal places of PLFTable.interest_rate and PLFTable.factor
+RATE_PLACES = Decimal('0.001')
+FACTOR_PLACES = Decimal('0.00001')
+
+
+def age_fingerprint(rows):
+    """Hash of one age's {rate: factor} rows, rounded as PLFTable stores them"""
+    text = ';'.join(f'{rate.quantize(RATE_PLACES)}:{factor.quantize(FACTOR_PLACES)}'
+                    for rate, factor in sorted(rows.items()))
+    return hashlib.sha1(text.encode()).hexdigest()
+
 
 class Command(BaseCommand):
     help = 'Import PLF data from CSV file into database'
@@ -13,10 +28,20 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--file', type=str, help='Path to the CSV file')
         parser.add_argument('--clear', action='store_true', help='Clear existing PLF data before import')
+        parser.add_argument('--update', action='store_true',
+                            help='Update the factor of existing entries when it differs from the CSV')
+        parser.add_argument('--sync', action='store_true',
+                            help='Make the table match the CSV, rewriting only the ages whose rows changed')
+        parser.add_argument('--config', type=int, help='ID of the HECMConfig to import into (defaults to the latest)')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Number of CSV rows read at a time')
 
     def handle(self, *args, **options):
         file_path = options.get('file')
         clear_existing = options.get('clear', False)
+        update_existing = options.get('update', False)
+        sync = options.get('sync', False)
+        config_id = options.get('config')
+        chunk_size = options.get('chunk_size') or 50000
 
         if not file_path:
             # Default path - adjust as needed
@@ -26,70 +51,157 @@ class Command(BaseCommand):
         if not os.path.exists(file_path):
             self.stdout.write(self.style.ERROR(f'File not found: {file_path}'))
             return
+        if sync and (clear_existing or update_existing):
+            self.stdout.write(self.style.ERROR('--sync cannot be combined with --clear or --update'))
+            return
 
         try:
-            # Load CSV file
-            self.stdout.write(f'Loading data from {file_path}...')
-            df = pd.read_csv(file_path)
-            self.stdout.write(f'Found {len(df)} entries in the CSV file')
-
-            # Get current config (or create a default one)
-            try:
-                # Try to get the latest config by ID (assuming latest has highest ID)
-                config = HECMConfig.objects.latest('id')
-                self.stdout.write(f'Using existing HECMConfig with ID: {config.id}')
-            except HECMConfig.DoesNotExist:
-                # Create a default config if none exists
-                config = HECMConfig.objects.create(
-                    fha_lending_limit=Decimal('970800.00'),  # 2022 limit, update as needed
-                    mip_rate=Decimal('0.02'),
-                    first_tier_limit=Decimal('200000.00'),
-                    first_tier_rate=Decimal('0.02'),
-                    second_tier_rate=Decimal('0.01'),
-                    origination_fee_min=Decimal('2500.00'),
-                    origination_fee_cap=Decimal('6000.00'),
-                )
-                self.stdout.write(self.style.WARNING('Created new HECMConfig as none existed'))
-
-            # Import data in batches to avoid memory issues
+            if config_id is not None:
+                try:
+                    config = HECMConfig.objects.get(pk=config_id)
+                except HECMConfig.DoesNotExist:
+                    self.stdout.write(self.style.ERROR(f'HECMConfig with ID {config_id} does not exist'))
+                    return
+                self.stdout.write(f'Using HECMConfig with ID: {config.id}')
+            else:
+                # Get current config (or create a default one)
+                try:
+                    # Try to get the latest config by ID (assuming latest has highest ID)
+                    config = HECMConfig.objects.latest('id')
+                    self.stdout.write(f'Using existing HECMConfig with ID: {config.id}')
+                except HECMConfig.DoesNotExist:
+                    # Create a default config if none exists
+                    config = HECMConfig.objects.create(
+                        fha_lending_limit=Decimal('970800.00'),  # 2022 limit, update as needed
+                        mip_rate=Decimal('0.02'),
+                        first_tier_limit=Decimal('200000.00'),
+                        first_tier_rate=Decimal('0.02'),
+                        second_tier_rate=Decimal('0.01'),
+                        origination_fee_min=Decimal('2500.00'),
+                        origination_fee_cap=Decimal('6000.00'),
+                    )
+                    self.stdout.write(self.style.WARNING('Created new HECMConfig as none existed'))
+
+            # Decided up front: a snapshot compiled before is recompiled with the new rows
+            recompile = os.path.exists(snapshot_path(config.id))
+
+            if sync:
+                self._sync(config, file_path, recompile)
+                return
+
+            # Write in batches small enough for the database's parameter limits
             batch_size = 1000
+            num_read = 0
             num_created = 0
+            num_updated = 0
+            started = time.perf_counter()
+
+            self.stdout.write(f'Loading data from {file_path} in chunks of {chunk_size} rows...')
 
             with transaction.atomic():
                 # First, clear existing data if requested
                 if clear_existing:
                     count = PLFTable.objects.filter(config=config).delete()[0]
                     self.stdout.write(f'Cleared {count} existing PLF table entries')
-
-                # Process in batches
-                for i in range(0, len(df), batch_size):
-                    batch = df.iloc[i:i + batch_size]
+                    existing = {}
+                else:
+                    # Preload the existing keys once instead of querying per CSV row
+                    existing = {
+                        (age, rate): (pk, factor)
+                        for pk, age, rate, factor in PLFTable.objects.filter(config=config).values_list(
+                            'pk', 'age', 'interest_rate', 'factor').iterator()
+                    }
+                    self.stdout.write(f'Found {len(existing)} existing PLF table entries')
+
+                for chunk in pd.read_csv(file_path, usecols=['Age', 'Rate', 'PLF'], chunksize=chunk_size):
                     plf_objects = []
-
-                    for _, row in batch.iterrows():
-                        # Check if this entry already exists
-                        exists = PLFTable.objects.filter(
-                            config=config,
-                            age=int(row['Age']),
-                            interest_rate=Decimal(str(row['Rate']))
-                        ).exists()
-
-                        if not exists:
-                            plf_objects.append(PLFTable(
-                                config=config,
-                                age=int(row['Age']),
-                                interest_rate=Decimal(str(row['Rate'])),
-                                factor=Decimal(str(row['PLF']))
-                            ))
-
+                    changed_objects = []
+
+                    for age, rate, plf in zip(chunk['Age'].tolist(), chunk['Rate'].tolist(), chunk['PLF'].tolist()):
+                        key = (int(age), Decimal(str(rate)))
+                        factor = Decimal(str(plf))
+                        entry = existing.get(key)
+
+                        if entry is None:
+                            # Remember the key so duplicates within the file are skipped too
+                            existing[key] = (None, factor)
+                            plf_objects.append(PLFTable(config=config, age=key[0], interest_rate=key[1], factor=factor))
+                        elif update_existing and entry[0] is not None and entry[1] != factor:
+                            existing[key] = (entry[0], factor)
+                            changed_objects.append(PLFTable(pk=entry[0], factor=factor))
+
+                    num_read += len(chunk)
                     if plf_objects:
-                        PLFTable.objects.bulk_create(plf_objects)
+                        PLFTable.objects.bulk_create(plf_objects, batch_size=batch_size)
                         num_created += len(plf_objects)
-                        self.stdout.write(f'Imported {num_created} entries so far...')
-                    else:
-                        self.stdout.write(f'Skipping batch starting at index {i} (all entries already exist)')
+                    if changed_objects:
+                        PLFTable.objects.bulk_update(changed_objects, ['factor'], batch_size=batch_size)
+                        num_updated += len(changed_objects)
+
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'Read {num_read} rows ({num_read / elapsed:,.0f} rows/sec): '
+                        f'{num_created} imported, {num_updated} updated so far...')
+
+                if clear_existing or num_created or num_updated:
+                    # bulk_create() and bulk_update() send no signals
+                    plf_data_changed(config.id)
 
-            self.stdout.write(self.style.SUCCESS(f'Successfully imported {num_created} PLF entries'))
+            if recompile:
+                self._recompile(config)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully imported {num_created} and updated {num_updated} PLF entries '
+                f'from {num_read} rows in {elapsed:.2f}s ({num_read / elapsed:,.0f} rows/sec)'))
 
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error importing data: {str(e)}'))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'Error importing data: {str(e)}'))
+
+    def _sync(self, config, file_path, recompile=False):
+        """
+        Write only the ages whose rate/factor rows differ from the CSV
+
+        Both sides are fingerprinted per age; a changed age has its rows
+        deleted and re-created in one transaction, and ages that are no
+        longer in the CSV are deleted.
+        """
+        started = time.perf_counter()
+        data = pd.read_csv(file_path, usecols=['Age', 'Rate', 'PLF'])
+        wanted = {}
+        for age, rate, plf in zip(data['Age'].tolist(), data['Rate'].tolist(), data['PLF'].tolist()):
+            # The first row of a duplicated key wins, as in a regular import
+            wanted.setdefault(int(age), {}).setdefault(Decimal(str(rate)).quantize(RATE_PLACES), Decimal(str(plf)))
+
+        stored = {}
+        for age, rate, factor in PLFTable.objects.filter(config=config).values_list(
+                'age', 'interest_rate', 'factor').iterator():
+            stored.setdefault(age, {})[rate] = factor
+        stored_fingerprints = {age: age_fingerprint(rows) for age, rows in stored.items()}
+
+        changed = sorted(age for age, rows in wanted.items() if age_fingerprint(rows) != stored_fingerprints.get(age))
+        removed = sorted(set(stored) - set(wanted))
+        if not changed and not removed:
+            self.stdout.write(self.style.SUCCESS(
+                f'PLF table of config {config.id} already matches {file_path} ({len(wanted)} ages)'))
+            return
+
+        with transaction.atomic():
+            deleted = PLFTable.objects.filter(config=config, age__in=changed + removed).delete()[0]
+            created = PLFTable.objects.bulk_create([
+                PLFTable(config=config, age=age, interest_rate=rate, factor=factor)
+                for age in changed for rate, factor in wanted[age].items()
+            ], batch_size=1000)
+            plf_data_changed(config.id)
+
+        if recompile:
+            self._recompile(config)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced config {config.id} in {elapsed:.2f}s: {len(changed)} ages rewritten ({len(created)} rows), '
+            f'{len(removed)} ages removed, {len(wanted) - len(changed)} unchanged; {deleted} rows deleted'))
+
+    def _recompile(self, config):
+        """Rewrite the config's snapshot at its new PLF version"""
+        version = write_snapshot(PLFIndex.build(config))
+        self.stdout.write(f'Recompiled PLF snapshot for config {config.id} (version {version})')
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...services.bench import benchmark_environment, seed
+from ...services.loadgen import DEFAULT_MIX, LoadHarness, generate_scenarios, parse_mix
+from contextlib import nullcontext
+import json
+
+
+class Command(BaseCommand):
+    help = ('Load the calculation endpoint in-process through the WSGI and/or ASGI application '
+            'and report throughput, latency percentiles, error rate and DB queries per request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='both',
+                            help='Application to drive (DjangoHECM.wsgi, DjangoHECM.asgi or both)')
+        parser.add_argument('--path', default='/hecm/calculate/', help='Endpoint to POST scenarios to')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per concurrency level')
+        parser.add_argument('--concurrency', default='1,4,16',
+                            help='Comma-separated concurrency levels (threads for WSGI, tasks for ASGI)')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Scenario mix as profile=weight pairs (default: {DEFAULT_MIX})')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the generated scenarios')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the quote result cache')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Use the configured database instead of a seeded temporary one')
+        parser.add_argument('--host', default='localhost', help='Host header to send (must be allowed)')
+        parser.add_argument('--json', metavar='PATH', help='Also write the results to a JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not levels or min(levels) < 1:
+            raise CommandError('Concurrency levels must be positive integers')
+
+        servers = ['wsgi', 'asgi'] if options['server'] == 'both' else [options['server']]
+        # Loading the applications runs django.setup() (and the logging config) again,
+        # so it happens before the benchmark environment adjusts either
+        applications = {server: self._application(server) for server in servers}
+        bodies = generate_scenarios(options['requests'], mix, options['seed'])
+        result_cache = None if options['no_cache'] else getattr(settings, 'HECM_RESULT_CACHE', None)
+
+        results = []
+        environment = nullcontext() if options['current_db'] else benchmark_environment(result_cache=result_cache)
+        with environment as tmp_dir:
+            if tmp_dir is not None:
+                seed(tmp_dir)
+            harness = LoadHarness(options['path'], options['host'])
+
+            self.stdout.write(f'{options["requests"]} requests per level to {options["path"]}, mix {options["mix"]}')
+            self.stdout.write(f'  {"server":<6} {"conc":>5} {"req/s":>9} {"p50 ms":>8} {"p90 ms":>8} '
+                              f'{"p99 ms":>8} {"errors":>8} {"queries":>8}')
+            for server in servers:
+                app = applications[server]
+                # Prime the CSRF cookie, the config cache and the PLF index outside the measurement
+                if server == 'wsgi':
+                    harness.prime_wsgi(app)
+                else:
+                    harness.prime_asgi(app)
+                if not harness.token:
+                    raise CommandError(f'No CSRF cookie from GET {options["path"]}; is {options["host"]} allowed?')
+
+                for concurrency in levels:
+                    stats = harness.run(server, app, bodies, concurrency)
+                    results.append(stats)
+                    queries = '-' if stats['db_queries'] is None else f'{stats["db_queries"]:.2f}'
+                    self.stdout.write(
+                        f'  {server:<6} {concurrency:>5} {stats["throughput"]:9.1f} '
+                        f'{stats["p50"] * 1000:8.2f} {stats["p90"] * 1000:8.2f} {stats["p99"] * 1000:8.2f} '
+                        f'{stats["error_rate"]:8.2%} {queries:>8}')
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({'path': options['path'], 'mix': mix, 'seed': options['seed'],
+                           'requests': options['requests'], 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved results to {options["json"]}'))
+
+    def _application(self, server):
+        """The project's deployed application objects"""
+        if server == 'wsgi':
+            from DjangoHECM.wsgi import application
+        else:
+            from DjangoHECM.asgi import application
+        return application
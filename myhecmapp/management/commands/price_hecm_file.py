@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...models.config import HECMConfig
+from ...services.file_pricing import price_file
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = ('Price a CSV of borrowers (age, home_value, interest_rate or margin, optional index_rate and '
+            'existing_mortgage) into an output CSV with the get_result_dict() columns, in input order')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Input CSV file')
+        parser.add_argument('output', help='Output CSV file')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per chunk')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (1 prices in this process)')
+        parser.add_argument('--config', type=int, help='ID of the HECMConfig to use (default: current)')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted run')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if not os.path.exists(options['input']):
+            raise CommandError(f'Input file not found: {options["input"]}')
+
+        config = None
+        if options['config']:
+            try:
+                config = HECMConfig.objects.get(pk=options['config'])
+            except HECMConfig.DoesNotExist:
+                raise CommandError(f'HECMConfig with ID {options["config"]} does not exist')
+
+        started = time.perf_counter()
+
+        def progress(rows, errors):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {rows} rows written ({errors} errors), {elapsed:.1f} s')
+
+        try:
+            rows, errors = price_file(options['input'], options['output'], options['chunk_size'],
+                                      options['workers'], config, options['resume'], progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Priced {rows} rows into {options["output"]} in {elapsed:.1f} s ({rate:.0f} rows/sec), '
+            f'{errors} rows with errors'))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...models.config import HECMConfig
+from ...models.results import HECMResult
+from ...services.repricing import affected_results, diff_configs, reprice_results
+import time
+
+
+class Command(BaseCommand):
+    help = ('Re-price the stored results of one HECMConfig with a newer one, recomputing only the results '
+            'whose quote changes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='old', type=int,
+                            help='ID of the config the results were priced with (default: the one before --to)')
+        parser.add_argument('--to', dest='new', type=int, help='ID of the config that takes effect (default: current)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Results recomputed per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the affected rows')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        new = self._config(options['new']) if options['new'] else HECMConfig.get_current()
+        if options['old']:
+            old = self._config(options['old'])
+        else:
+            old = (HECMConfig.objects.filter(effective_date__lte=new.effective_date).exclude(pk=new.pk)
+                   .order_by('-effective_date', '-id').first())
+            if old is None:
+                raise CommandError(f'No config before config {new.pk}; pass --from')
+        if old.pk == new.pk:
+            raise CommandError('--from and --to are the same config')
+
+        stored = HECMResult.objects.filter(config_used=old).count()
+        self.stdout.write(f'Config {old.pk} ({old.effective_date}) -> {new.pk} ({new.effective_date}): '
+                          f'{stored} stored results')
+        changes = diff_configs(old, new)
+        if not changes:
+            self.stdout.write('No pricing field changed')
+        for field, (old_value, new_value, query) in changes.items():
+            touched = HECMResult.objects.filter(config_used=old).filter(query).count()
+            self.stdout.write(f'  {field:<22} {old_value} -> {new_value}: {touched} rows')
+
+        affected = affected_results(old, new).count()
+        self.stdout.write(f'{affected} of {stored} results need re-pricing')
+        if options['dry_run']:
+            return
+
+        started = time.perf_counter()
+
+        def progress(repriced):
+            self.stdout.write(f'  {repriced}/{affected} repriced')
+
+        repriced, moved = reprice_results(old, new, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Repriced {repriced} results in {time.perf_counter() - started:.1f} s; '
+            f'moved {moved} unaffected results to config {new.pk}'))
+
+    def _config(self, pk):
+        try:
+            return HECMConfig.objects.get(pk=pk)
+        except HECMConfig.DoesNotExist:
+            raise CommandError(f'HECMConfig with ID {pk} does not exist')
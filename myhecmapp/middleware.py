@@ -0,0 +1,77 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from .services.metrics import REQUEST_DB_QUERIES, REQUEST_SECONDS
+import contextvars
+import time
+
+# Query counter of the request being handled; a context variable follows the
+# request into the worker threads used by sync_to_async
+_query_count = contextvars.ContextVar('hecm_query_count', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_counter(sender, connection, **kwargs):
+    """Count queries on every database connection, whichever thread opens it"""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match is not None else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the latency and the number of database queries of every request
+
+    Works for sync (WSGI) and async (ASGI) requests without switching
+    threads. Streaming responses are timed until the view returns, before
+    their body is generated.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Connections opened before this middleware was loaded missed the signal
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(None, connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _query_count.set([0])
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self._observe(request, start)
+            _query_count.reset(token)
+
+    async def __acall__(self, request):
+        token = _query_count.set([0])
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._observe(request, start)
+            _query_count.reset(token)
+
+    def _observe(self, request, start):
+        view = _view_name(request)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, view)
+        REQUEST_DB_QUERIES.observe(_query_count.get()[0], view)
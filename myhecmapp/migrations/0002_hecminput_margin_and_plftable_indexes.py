@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:46
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myhecmapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hecminput',
+            name='margin',
+            field=models.DecimalField(decimal_places=2, default=Decimal('2.00'), help_text="Lender's margin (percentage)", max_digits=3),
+        ),
+        migrations.AlterField(
+            model_name='hecminput',
+            name='age',
+            field=models.IntegerField(help_text='Age of youngest borrower'),
+        ),
+        migrations.AlterField(
+            model_name='hecminput',
+            name='existing_mortgage',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Amount of existing mortgage to be paid off', max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='hecminput',
+            name='home_value',
+            field=models.DecimalField(decimal_places=2, help_text='Appraised home value', max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='hecminput',
+            name='interest_rate',
+            field=models.DecimalField(decimal_places=3, help_text='Expected interest rate (index + margin)', max_digits=5),
+        ),
+        migrations.AddIndex(
+            model_name='plftable',
+            index=models.Index(fields=['age'], name='plftable_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plftable',
+            index=models.Index(fields=['interest_rate'], name='plftable_rate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plftable',
+            index=models.Index(fields=['age', 'interest_rate'], name='plftable_age_rate_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myhecmapp', '0002_hecminput_margin_and_plftable_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hecminput',
+            index=models.Index(fields=['home_value'], name='hecminput_home_value_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myhecmapp', '0003_hecminput_home_value_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hecmconfig',
+            name='plf_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Incremented in the transaction that changes the config's PLF table rows"),
+        ),
+    ]
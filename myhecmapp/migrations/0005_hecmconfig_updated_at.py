@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myhecmapp', '0004_hecmconfig_plf_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hecmconfig',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
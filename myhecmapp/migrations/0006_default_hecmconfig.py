@@ -0,0 +1,33 @@
+import datetime
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def create_default_config(apps, schema_editor):
+    """Seed the default config that HECMConfig.get_current() used to create on first read"""
+    HECMConfig = apps.get_model('myhecmapp', 'HECMConfig')
+    if HECMConfig.objects.exists():
+        return
+    HECMConfig.objects.create(
+        effective_date=datetime.date(2025, 1, 1),
+        fha_lending_limit=Decimal('1089300'),
+        min_age=62,
+        mip_rate=Decimal('0.02'),
+        origination_fee_min=Decimal('2500'),
+        origination_fee_cap=Decimal('6000'),
+        first_tier_limit=Decimal('200000'),
+        first_tier_rate=Decimal('0.02'),
+        second_tier_rate=Decimal('0.01')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myhecmapp', '0005_hecmconfig_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_config, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,29 @@
+from django.conf import settings
 from django.db import models
-from decimal import Decimal
+from bisect import bisect_right
+from datetime import date, datetime
+import asyncio
+import hashlib
+import threading
+import time
+
+# Process-local cache of all configs sorted by effective date, see HECMConfig._cached()
+_cache = None
+_cache_generation = 0
+# Re-entrant: _cached() stores the loaded configs while holding it
+_cache_lock = threading.RLock()
+# {pk: (updated_at, plf_version)} last read from the database and when, see HECMConfig.versions()
+_versions = {}
+_versions_read = 0.0
+
+
+def _in_event_loop():
+    """Whether this thread runs an event loop, where the synchronous ORM can't be used"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
 
 
 class HECMConfig(models.Model):
@@ -50,25 +74,147 @@ class HECMConfig(models.Model):
         default=0.01,
         help_text="Rate for second tier origination fee calculation"
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    plf_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented in the transaction that changes the config's PLF table rows"
+    )
 
     class Meta:
         get_latest_by = "effective_date"
 
+    def fingerprint(self):
+        """Short hash of the settings used by calculations; changes whenever one of them changes"""
+        values = [str(self.pk), str(self.effective_date)]
+        values += [str(getattr(self, field)) for field in (
+            'fha_lending_limit', 'min_age', 'mip_rate', 'origination_fee_min', 'origination_fee_cap',
+            'first_tier_limit', 'first_tier_rate', 'second_tier_rate')]
+        return hashlib.sha1('|'.join(values).encode()).hexdigest()[:16]
+
+    def valid_until(self):
+        """Effective date of the config that supersedes this one, or None when none is scheduled"""
+        effective_dates, configs = self._cached()
+        i = bisect_right(effective_dates, self.effective_date)
+        return effective_dates[i] if i < len(effective_dates) else None
+
+    @classmethod
+    def versions(cls):
+        """
+        Return {pk: (updated_at, plf_version)} of every config as last read from the database
+
+        The versions are re-read at most every HECM_VERSION_CHECK_INTERVAL
+        seconds (never from a thread running an event loop, see aversions()),
+        so every process notices configs saved or deleted and PLF rows changed
+        by other processes, on any host. A new dictionary is returned after
+        each read.
+        """
+        if cls._versions_due() and not _in_event_loop():
+            cls._store_versions(cls.objects.values_list('pk', 'updated_at', 'plf_version'))
+        return _versions
+
+    @classmethod
+    async def aversions(cls):
+        """Async versions(): re-read with the async ORM"""
+        if cls._versions_due():
+            cls._store_versions([row async for row in cls.objects.values_list('pk', 'updated_at', 'plf_version')])
+        return _versions
+
+    @classmethod
+    def _versions_due(cls):
+        interval = getattr(settings, 'HECM_VERSION_CHECK_INTERVAL', 1.0)
+        return interval is not None and time.monotonic() - _versions_read >= interval
+
+    @classmethod
+    def _store_versions(cls, rows):
+        """Keep freshly read versions and drop the cached configs if one was saved or deleted meanwhile"""
+        global _versions, _versions_read
+        _versions_read = time.monotonic()
+        _versions = {pk: (updated_at, plf_version) for pk, updated_at, plf_version in rows}
+        cache = _cache
+        if cache is not None and {config.pk: config.updated_at for config in cache[1]} != {
+                pk: updated_at for pk, (updated_at, _) in _versions.items()}:
+            cls.clear_cache()
+
+    @classmethod
+    def _cached(cls):
+        """
+        Return (effective_dates, configs) sorted by effective date
+
+        The configs are loaded once per process and kept until clear_cache()
+        is called, which happens whenever a config is saved or deleted in this
+        process, or versions() finds one saved or deleted by another one.
+
+        Raises:
+            HECMConfig.DoesNotExist: There is no config at all (migrations seed a default one)
+        """
+        cls.versions()
+        cache = _cache
+        if cache is not None:
+            return cache
+
+        with _cache_lock:
+            if _cache is not None:
+                return _cache
+            generation = _cache_generation
+            configs = list(cls.objects.order_by('effective_date', 'id'))
+            return cls._store_cache(configs, generation)
+
+    @classmethod
+    def _store_cache(cls, configs, generation):
+        """Cache configs loaded while the cache was at the given generation"""
+        global _cache
+        if not configs:
+            raise cls.DoesNotExist("No HECMConfig exists (migrate seeds a default one)")
+        cache = ([config.effective_date for config in configs], configs)
+        with _cache_lock:
+            # Don't keep the result if the configs changed while loading
+            if generation == _cache_generation:
+                _cache = cache
+        return cache
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop the cached configs so they are reloaded on next use"""
+        global _cache, _cache_generation
+        with _cache_lock:
+            _cache = None
+            _cache_generation += 1
+
     @classmethod
     def get_current(cls):
         """Get the most recent configuration"""
-        try:
-            return cls.objects.latest()
-        except cls.DoesNotExist:
-            # Create default config if none exists
-            return cls.objects.create(
-                effective_date="2025-01-01",
-                fha_lending_limit=Decimal('1089300'),
-                min_age=62,
-                mip_rate=Decimal('0.02'),
-                origination_fee_min=Decimal('2500'),
-                origination_fee_cap=Decimal('6000'),
-                first_tier_limit=Decimal('200000'),
-                first_tier_rate=Decimal('0.02'),
-                second_tier_rate=Decimal('0.01')
-            )
+        return cls._cached()[1][-1]
+
+    @classmethod
+    async def aget_current(cls):
+        """Async get_current(): served from the cache, queried with the async ORM on a miss (never in a thread)"""
+        await cls.aversions()
+        cache = _cache
+        if cache is None:
+            generation = _cache_generation
+            configs = [config async for config in cls.objects.order_by('effective_date', 'id')]
+            cache = cls._store_cache(configs, generation)
+        return cache[1][-1]
+
+    @classmethod
+    def get_effective(cls, as_of):
+        """
+        Get the configuration that was in effect on a given date
+
+        Args:
+            as_of: date, datetime or ISO date string
+
+        Returns:
+            The config with the latest effective_date on or before as_of
+        """
+        if isinstance(as_of, datetime):
+            as_of = as_of.date()
+        elif isinstance(as_of, str):
+            as_of = date.fromisoformat(as_of)
+
+        effective_dates, configs = cls._cached()
+        i = bisect_right(effective_dates, as_of)
+        if i == 0:
+            raise cls.DoesNotExist(f"No HECMConfig in effect on {as_of}")
+        return configs[i - 1]
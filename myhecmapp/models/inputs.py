@@ -29,6 +29,13 @@ class HECMInput(models.Model):
         default=Decimal('0.00'),
         help_text="Amount of existing mortgage to be paid off"
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Range scans of home values, e.g. when re-pricing after a config change
+        indexes = [
+            models.Index(fields=['home_value'], name='hecminput_home_value_idx'),
+        ]
 
     def clean(self):
         """Validate inputs"""
@@ -0,0 +1,254 @@
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, close_old_connections, connection, models, transaction
+from ..models.inputs import HECMInput
+from ..models.results import HECMResult
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger('myhecmapp')
+
+# HECMInput fields saved for a quote
+INPUT_FIELDS = ('age', 'home_value', 'margin', 'interest_rate', 'existing_mortgage')
+
+# HECMResult field -> HECMCalculator stage computing it (the Decimal values calculate() returns)
+RESULT_STAGES = {
+    'max_claim_amount': 'get_max_claim_amount',
+    'principal_limit_factor': 'get_principal_limit_factor',
+    'principal_limit': 'calculate_principal_limit',
+    'origination_fee': 'calculate_origination_fee',
+    'mortgage_insurance_premium': 'calculate_mortgage_insurance_premium',
+    'other_closing_costs': 'estimate_other_closing_costs',
+    'total_closing_costs': 'calculate_total_closing_costs',
+    'max_cash_out': 'calculate_max_cash_out',
+}
+
+# HECMResult field -> get_result_dict() key
+RESULT_FIELDS = {
+    'max_claim_amount': 'max_claim_amount',
+    'principal_limit_factor': 'principal_limit_factor',
+    'principal_limit': 'principal_limit',
+    'origination_fee': 'max_origination_fee',
+    'mortgage_insurance_premium': 'mortgage_insurance_premium',
+    'other_closing_costs': 'other_closing_costs',
+    'total_closing_costs': 'total_closing_costs',
+    'max_cash_out': 'max_cash_out',
+}
+
+
+def field_value(field, value):
+    """
+    Fit a value to a model field: rounded half up to its decimal places and validated
+
+    Raises:
+        ValidationError: The value does not fit the column, e.g. more digits than max_digits
+    """
+    if isinstance(field, models.DecimalField):
+        try:
+            value = Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+        except ArithmeticError:
+            raise ValidationError(f"{field.name} is not a finite number with {field.max_digits} digits: {value}")
+    field.run_validators(value)
+    return value
+
+
+class QuoteRecorder:
+    """
+    Write-behind recorder of quotes for the audit trail
+
+    record() only puts the quote on a bounded in-memory queue; a background
+    thread saves queued quotes as HECMInput/HECMResult rows with bulk_create,
+    whenever batch_size quotes are waiting or flush_interval seconds passed.
+    Quotes arriving while the queue is full are dropped and counted.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=1.0, max_queue=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, calculator):
+        """
+        Queue one quote for saving
+
+        Args:
+            calculator: HECMCalculator the quote was calculated with; its
+                Decimal results are saved (stages it did not run yet, e.g. for
+                a quote served from the quote cache, run on the recorder thread)
+        """
+        try:
+            self._queue.put_nowait(calculator)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.recorded += 1
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='hecm-quote-recorder', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.stop)
+
+    def _run(self):
+        """Background loop: collect batches and write them"""
+        try:
+            while not self._stop.is_set():
+                batch = self._collect(self.batch_size, self.flush_interval)
+                if batch:
+                    self._write(batch)
+        finally:
+            connection.close()
+
+    def _collect(self, limit, timeout):
+        """Take up to limit queued quotes, waiting at most timeout seconds for them"""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _rows(self, batch):
+        """
+        Build the unsaved (HECMInput, HECMResult) pairs of a batch
+
+        Values are rounded to the columns' decimal places; a quote with a
+        value the columns can't hold is logged and counted as failed.
+        """
+        rows = []
+        for calculator in batch:
+            try:
+                input_data = HECMInput(**{
+                    name: field_value(HECMInput._meta.get_field(name), getattr(calculator.input_data, name))
+                    for name in INPUT_FIELDS
+                })
+                # The stages are memoized, so a quote that was just calculated isn't computed again
+                result = HECMResult(config_used_id=calculator.config.pk, **{
+                    name: field_value(HECMResult._meta.get_field(name), getattr(calculator, stage)())
+                    for name, stage in RESULT_STAGES.items()
+                })
+            except Exception as e:
+                logger.error(f"Error recording quote for age {calculator.input_data.age}, "
+                             f"home value {calculator.input_data.home_value}: {str(e)}")
+                with self._lock:
+                    self.failed += 1
+                continue
+            rows.append((input_data, result))
+        return rows
+
+    def _save(self, rows):
+        """Save (HECMInput, HECMResult) pairs with one bulk_create per model, in one transaction"""
+        with transaction.atomic():
+            inputs = HECMInput.objects.bulk_create([input_data for input_data, _ in rows])
+            for input_data, (_, result) in zip(inputs, rows):
+                result.input_data = input_data
+            HECMResult.objects.bulk_create([result for _, result in rows])
+
+    def _write(self, batch):
+        """
+        Save a batch of quotes as HECMInput and HECMResult rows
+
+        When the batch insert fails the quotes are saved one by one, so only
+        the quotes the database rejects are lost.
+        """
+        close_old_connections()
+        rows = self._rows(batch)
+        if not rows:
+            return
+        try:
+            self._save(rows)
+        except DatabaseError as e:
+            logger.warning(f"Error recording {len(rows)} quotes, saving them one by one: {str(e)}")
+        else:
+            with self._lock:
+                self.written += len(rows)
+            return
+
+        for row in rows:
+            # The failed batch may have assigned primary keys before rolling back
+            row[0].pk = row[1].pk = None
+            try:
+                self._save([row])
+            except DatabaseError as e:
+                logger.error(f"Error recording quote for age {row[0].age}, home value {row[0].home_value}: {str(e)}")
+                with self._lock:
+                    self.failed += 1
+            else:
+                with self._lock:
+                    self.written += 1
+
+    def flush(self):
+        """Write every queued quote now, in the calling thread"""
+        while True:
+            batch = self._collect(self.batch_size, 0.001)
+            if not batch:
+                break
+            self._write(batch)
+
+    def stop(self):
+        """Stop the background thread and write what is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        """Return the recorded/written/dropped/failed counters and the queue length"""
+        with self._lock:
+            return {
+                'recorded': self.recorded,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'queued': self._queue.qsize()
+            }
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_quote_recorder():
+    """Return the QuoteRecorder configured by settings.HECM_AUDIT, or None when disabled"""
+    global _recorder
+    options = getattr(settings, 'HECM_AUDIT', None)
+    if not options or not options.get('ENABLED'):
+        return None
+
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = QuoteRecorder(
+                    batch_size=options.get('BATCH_SIZE', 500),
+                    flush_interval=options.get('FLUSH_INTERVAL', 1.0),
+                    max_queue=options.get('MAX_QUEUE', 10000)
+                )
+    return _recorder
+
+
+def record_quote(calculator):
+    """Queue a calculated quote for the audit trail when recording is enabled"""
+    recorder = get_quote_recorder()
+    if recorder is not None:
+        recorder.record(calculator)
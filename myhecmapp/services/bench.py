@@ -0,0 +1,290 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import connections
+from django.test import override_settings
+from ..models.config import HECMConfig
+from ..models.tables import PLFTable
+from .calculator import HECMCalculator
+from .plf_index import get_plf_index, invalidate_plf_index
+from .result_cache import reset_quote_cache
+import csv
+import gc
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+
+# Grid of the seeded PLFTable rows (exact lookups) and of the seeded CSV (nearest lookups)
+TABLE_AGES = range(62, 96)
+TABLE_RATES = [Decimal('3.000') + Decimal('0.125') * i for i in range(56)]
+CSV_AGES = range(62, 100)
+CSV_RATES = [Decimal('3.00') + Decimal('0.25') * i for i in range(29)]
+
+# Ages past every seeded table, resolved with the approximation formula
+OUT_OF_TABLE_AGES = range(100, 111)
+
+PERCENTILES = (50, 90, 99)
+
+
+def seeded_factor(age, rate):
+    """Deterministic, plausible Principal Limit Factor for the seeded tables"""
+    factor = Decimal('0.35') + (age - 62) * Decimal('0.008') - (rate - 5) * Decimal('0.03')
+    return min(Decimal('0.75'), max(Decimal('0.2'), factor)).quantize(Decimal('0.00001'))
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * q // 100))
+    return samples[int(rank) - 1]
+
+
+def summarize(samples, items_per_op=1):
+    """
+    Reduce per-operation timings to throughput and latency percentiles
+
+    Args:
+        samples: Wall time of each operation in seconds
+        items_per_op: Quotes or lookups done by one operation (e.g. a batch size)
+
+    Returns:
+        Dictionary with ops_per_sec, items_per_sec, mean and the percentiles (seconds)
+    """
+    samples = sorted(samples)
+    total = sum(samples)
+    stats = {
+        'iterations': len(samples),
+        'ops_per_sec': len(samples) / total if total else 0.0,
+        'items_per_sec': len(samples) * items_per_op / total if total else 0.0,
+        'mean': total / len(samples) if samples else 0.0,
+    }
+    for q in PERCENTILES:
+        stats[f'p{q}'] = percentile(samples, q)
+    return stats
+
+
+def measure(op, iterations, warmup=0):
+    """
+    Time op() iterations times after warmup untimed calls
+
+    The garbage collector is paused while timing, like timeit does, so a
+    collection triggered by an earlier workload does not land in this one.
+    """
+    for _ in range(warmup):
+        op()
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    samples = []
+    try:
+        clock = time.perf_counter
+        for _ in range(iterations):
+            start = clock()
+            op()
+            samples.append(clock() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    return samples
+
+
+def _reset_caches():
+    HECMConfig.clear_cache()
+    invalidate_plf_index()
+    reset_quote_cache()
+    HECMCalculator._plf_data = None
+
+
+@contextmanager
+def benchmark_environment(quiet=True, result_cache=None):
+    """
+    Run the benchmarks against a temporary SQLite database
+
+    The default connection is pointed at a fresh migrated database in a
+    temporary directory, and the audit trail and PLF snapshots are disabled
+    (as is the quote cache, unless result_cache is given) so every operation
+    does the full work. Everything is restored on exit.
+
+    Args:
+        quiet: Silence the per-quote INFO logging while benchmarking
+        result_cache: Optional HECM_RESULT_CACHE setting to use
+
+    Yields:
+        Path of the temporary directory (for seeded files)
+    """
+    tmp_dir = tempfile.mkdtemp(prefix='hecm_bench_')
+    connection = connections['default']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    test_settings['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+    logger = logging.getLogger('myhecmapp')
+    old_level = logger.level
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(HECM_RESULT_CACHE=result_cache, HECM_AUDIT={'ENABLED': False},
+                               HECM_PLF_SNAPSHOT_DIR=os.path.join(tmp_dir, 'snapshots')):
+            if quiet:
+                # One INFO summary per quote would flood the console
+                logger.setLevel(logging.WARNING)
+            _reset_caches()
+            yield tmp_dir
+    finally:
+        logger.setLevel(old_level)
+        _reset_caches()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def seed(tmp_dir):
+    """
+    Seed the current config's PLFTable rows and a PLF CSV file
+
+    Returns:
+        (config, csv_path) tuple
+    """
+    config = HECMConfig.get_current()
+    PLFTable.objects.bulk_create([
+        PLFTable(config=config, age=age, interest_rate=rate, factor=seeded_factor(age, rate))
+        for age in TABLE_AGES for rate in TABLE_RATES
+    ])
+
+    csv_path = os.path.join(tmp_dir, 'plf.csv')
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Age', 'Rate', 'PLF'])
+        for age in CSV_AGES:
+            for rate in CSV_RATES:
+                writer.writerow([age, rate, seeded_factor(age, rate)])
+
+    HECMCalculator.load_plf_data(csv_path)
+    invalidate_plf_index()
+    get_plf_index(config)
+    return config, csv_path
+
+
+class Workloads:
+    """Seeded benchmark workloads; each method returns (op, items_per_op)"""
+
+    names = ('single_quote', 'recalculate_with_margin', 'sweep_margins', 'calculate_many',
+             'calculate_many_cents', 'calculate_many_float', 'plf_exact', 'plf_nearest', 'plf_out_of_table', 'load_plf_data_cold')
+
+    def __init__(self, config, csv_path, seed=42, batch_size=1000):
+        self.config = config
+        self.csv_path = csv_path
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+
+    def _scenarios(self, count, ages=TABLE_AGES, rates=TABLE_RATES):
+        rng = self.rng
+        return [{
+            'age': rng.choice(ages),
+            'home_value': Decimal(rng.randrange(100000, 1500000, 1000)),
+            'interest_rate': rng.choice(rates),
+            'existing_mortgage': Decimal(rng.randrange(0, 200000, 5000))
+        } for _ in range(count)]
+
+    def _cycle(self, items, call):
+        """Op that applies call to the next item on each invocation"""
+        state = {'i': 0}
+
+        def op():
+            i = state['i']
+            state['i'] = i + 1
+            call(items[i % len(items)])
+
+        return op
+
+    def single_quote(self):
+        """Full quote through get_result_dict(), config resolved from the cache"""
+        return self._cycle(self._scenarios(1000),
+                           lambda scenario: HECMCalculator(scenario).get_result_dict()), 1
+
+    def recalculate_with_margin(self):
+        """Re-pricing an existing quote at another margin"""
+        calculators = [HECMCalculator(scenario, self.config) for scenario in self._scenarios(100)]
+        margins = [Decimal('1.000') + Decimal('0.125') * self.rng.randrange(24) for _ in range(1000)]
+        pairs = [(calculators[i % len(calculators)], margin) for i, margin in enumerate(margins)]
+        return self._cycle(pairs, lambda pair: pair[0].recalculate_with_margin(pair[1])), 1
+
+    def sweep_margins(self):
+        """50-point margin grid for one borrower"""
+        margins = [Decimal('1.000') + Decimal('0.0625') * i for i in range(50)]
+        calculators = [HECMCalculator(scenario, self.config) for scenario in self._scenarios(100)]
+        return self._cycle(calculators, lambda calculator: calculator.sweep_margins(margins)), len(margins)
+
+    def calculate_many(self, numeric='decimal'):
+        """Vectorized pricing of one batch"""
+        scenarios = self._scenarios(self.batch_size)
+        columns = {key: [scenario[key] for scenario in scenarios] for key in scenarios[0]}
+
+        def op():
+            HECMCalculator.calculate_many(config=self.config, numeric=numeric, **columns)
+
+        return op, self.batch_size
+
+    def calculate_many_cents(self):
+        """Vectorized pricing of one batch in integer cents"""
+        return self.calculate_many('cents')
+
+    def calculate_many_float(self):
+        """Vectorized pricing of one batch in float64"""
+        return self.calculate_many('float')
+
+    def _plf(self, scenarios):
+        calculators = [HECMCalculator(scenario, self.config) for scenario in scenarios]
+
+        def lookup(calculator):
+            calculator.reset()
+            calculator.get_principal_limit_factor()
+
+        return self._cycle(calculators, lookup), 1
+
+    def plf_exact(self):
+        """PLF found in the config's PLFTable rows"""
+        return self._plf(self._scenarios(1000))
+
+    def plf_nearest(self):
+        """PLF resolved to the nearest rate of the CSV data"""
+        off_grid = [rate + Decimal('0.1') for rate in CSV_RATES]
+        return self._plf(self._scenarios(1000, ages=CSV_AGES, rates=off_grid))
+
+    def plf_out_of_table(self):
+        """PLF for an age missing from every table (approximation formula)"""
+        return self._plf(self._scenarios(1000, ages=OUT_OF_TABLE_AGES))
+
+    def load_plf_data_cold(self):
+        """Reading the PLF CSV with pandas from scratch"""
+        def op():
+            HECMCalculator._plf_data = None
+            HECMCalculator.load_plf_data(self.csv_path)
+
+        return op, 1
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare benchmark results with a saved baseline
+
+    A workload regresses when its median latency grew by more than
+    threshold percent.
+
+    Returns:
+        List of (name, baseline p50, current p50, change in percent) for every
+        workload present in both, and the names of the regressed workloads
+    """
+    rows = []
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('p50'):
+            continue
+        change = (stats['p50'] / previous['p50'] - 1) * 100
+        rows.append((name, previous['p50'], stats['p50'], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
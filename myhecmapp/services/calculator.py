@@ -1,26 +1,91 @@
-from decimal import Decimal
+from bisect import bisect_left
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP, Decimal
+from functools import wraps
 from ..models.config import HECMConfig
 from ..models.inputs import HECMInput
 from ..models.results import HECMResult
-from ..models.tables import PLFTable
+from .metrics import CONFIG_LOOKUP_SECONDS, PLF_RESOLUTION_SECONDS, PLF_RESOLUTIONS, STAGE_SECONDS
+from .plf_index import default_csv_path, get_plf_index
+from .projection import PLAN_LINE_OF_CREDIT, project_loans
+from .result_cache import get_quote_cache
 import logging
-import pandas as pd
+import numpy as np
 import os
+import time
 
 logger = logging.getLogger('myhecmapp')
 
+# PLF source reported when no index entry matched
+SOURCE_APPROXIMATION = 'approximation'
+
+# Numeric modes of HECMCalculator.calculate_many
+NUMERIC_DECIMAL = 'decimal'
+NUMERIC_CENTS = 'cents'
+NUMERIC_FLOAT = 'float'
+NUMERIC_MODES = (NUMERIC_DECIMAL, NUMERIC_CENTS, NUMERIC_FLOAT)
+
+# Fixed-point scale of rates and factors in the cents mode (6 decimal places)
+RATIO_SCALE = 10 ** 6
+
+# Fixed-point scale of intermediate currency amounts in the cents mode (1/100 of a cent);
+# only the returned fields are rounded to whole cents
+CURRENCY_SCALE = 10 ** 4
+
+# Result fields compared at cent level by the numeric audit
+CURRENCY_FIELDS = ('principal_limit', 'max_cash_out', 'max_origination_fee', 'max_claim_amount',
+                   'mortgage_insurance_premium', 'other_closing_costs', 'total_closing_costs')
+
+# Divergent values listed in a numeric audit report
+AUDIT_EXAMPLES = 10
+
+# Keys of get_result_dict(), in order (calculate_many() returns the same fields)
+RESULT_COLUMNS = ('principal_limit', 'max_cash_out', 'max_origination_fee', 'max_claim_amount',
+                  'principal_limit_factor', 'mortgage_insurance_premium', 'other_closing_costs',
+                  'total_closing_costs', 'margin', 'index_rate', 'interest_rate')
+
+# Flat estimate of the closing costs besides the origination fee and MIP (appraisal, title, etc.)
+OTHER_CLOSING_COSTS = Decimal('3000.00')
+
+# Oldest age searched by HECMCalculator.solve_min_age (the last age of the HUD PLF tables)
+SOLVER_MAX_AGE = 99
+
+# Columns of the table returned by HECMCalculator.sweep_margins
+SWEEP_COLUMNS = ('index_rate', 'margin', 'interest_rate', 'principal_limit_factor',
+                 'principal_limit', 'max_cash_out')
+
+
+def _stage(method):
+    """Memoize a calculation stage so it runs at most once per calculator, timing each computation"""
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self):
+        try:
+            return self._stages[name]
+        except KeyError:
+            start = time.perf_counter()
+            value = self._stages[name] = method(self)
+            STAGE_SECONDS.observe(time.perf_counter() - start, name)
+            return value
+
+    return wrapper
+
 
 class HECMCalculator:
     """Service class that performs HECM calculations"""
 
     # Class variable to cache CSV data
     _plf_data = None
+    # (path, modification time) of the loaded CSV, see refresh_plf_data()
+    _plf_source = None
 
     @classmethod
     def load_plf_data(cls, csv_path=None):
         """
         Load PLF data from CSV file into a pandas DataFrame
 
+        Quotes don't need this: the PLF index reads the CSV without pandas.
+
         Args:
             csv_path: Path to the CSV file (optional)
 
@@ -30,14 +95,17 @@ class HECMCalculator:
         if cls._plf_data is not None:
             return cls._plf_data
 
+        # pandas is slow to import and only needed by tools, not by the quote path
+        import pandas as pd
+
         if csv_path is None:
-            # Default path - adjust according to your project structure
-            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            csv_path = os.path.join(base_dir, 'data', 'consolidated_2017_plfs copy.csv')
+            csv_path = default_csv_path()
 
         try:
             logger.info(f"Loading PLF data from CSV file: {csv_path}")
+            mtime = os.path.getmtime(csv_path)
             cls._plf_data = pd.read_csv(csv_path)
+            cls._plf_source = (csv_path, mtime)
             logger.info(f"Successfully loaded PLF data with {len(cls._plf_data)} entries")
             return cls._plf_data
         except Exception as e:
@@ -45,7 +113,35 @@ class HECMCalculator:
             # Return empty DataFrame as fallback
             return pd.DataFrame(columns=['Age', 'Rate', 'PLF'])
 
-    def __init__(self, input_data, config=None, index_rate=None):
+    @classmethod
+    def refresh_plf_data(cls):
+        """
+        Re-read the CSV loaded by load_plf_data() if the file changed since
+
+        The new DataFrame is read completely before it replaces the old one,
+        so readers see either the old or the new data.
+
+        Returns:
+            True when the data was reloaded
+        """
+        source = cls._plf_source
+        if cls._plf_data is None or source is None:
+            return False
+        csv_path, mtime = source
+        try:
+            current = os.path.getmtime(csv_path)
+        except OSError:
+            return False
+        if current == mtime:
+            return False
+
+        import pandas as pd
+        data = pd.read_csv(csv_path)
+        cls._plf_data, cls._plf_source = data, (csv_path, current)
+        logger.info(f"Reloaded PLF data with {len(data)} entries from {csv_path}")
+        return True
+
+    def __init__(self, input_data, config=None, index_rate=None, as_of=None):
         """
         Initialize calculator with input data and optional config
 
@@ -53,6 +149,7 @@ class HECMCalculator:
             input_data: HECMInput instance or dict with input parameters
             config: Optional HECMConfig instance (uses latest by default)
             index_rate: Optional index rate (defaults to 10-year LIBOR or similar index)
+            as_of: Optional date; uses the config in effect on that date instead of the latest
         """
         if isinstance(input_data, dict):
             # Convert all numeric values to Decimal
@@ -69,19 +166,21 @@ class HECMCalculator:
                     # Default index rate if not provided
                     index_rate = Decimal('3.50')
                 input_dict['interest_rate'] = index_rate + input_dict['margin']
-                logger.info(
-                    f"Calculated interest rate: {input_dict['interest_rate']} (index {index_rate} + margin {input_dict['margin']})")
+                logger.debug("Calculated interest rate: %s (index %s + margin %s)",
+                             input_dict['interest_rate'], index_rate, input_dict['margin'],
+                             extra={'event': 'input.derived'})
 
             # If no margin provided but we have interest_rate and index_rate, calculate margin
             elif 'interest_rate' in input_dict and 'margin' not in input_dict and index_rate is not None:
                 input_dict['margin'] = input_dict['interest_rate'] - index_rate
-                logger.info(
-                    f"Calculated margin: {input_dict['margin']} (rate {input_dict['interest_rate']} - index {index_rate})")
+                logger.debug("Calculated margin: %s (rate %s - index %s)",
+                             input_dict['margin'], input_dict['interest_rate'], index_rate,
+                             extra={'event': 'input.derived'})
 
             # Default margin if not provided
             elif 'margin' not in input_dict:
                 input_dict['margin'] = Decimal('2.00')  # Default 2% margin
-                logger.info(f"Using default margin of 2.00%")
+                logger.debug("Using default margin of 2.00%%", extra={'event': 'input.derived'})
 
             self.input_data = HECMInput(**input_dict)
             if not self.input_data.pk:  # If it's a new instance that hasn't been saved
@@ -89,102 +188,58 @@ class HECMCalculator:
         else:
             self.input_data = input_data
 
-        self.config = config or HECMConfig.get_current()
+        if config is None:
+            with CONFIG_LOOKUP_SECONDS.time():
+                config = _resolve_config(as_of)
+        self.config = config
         self.index_rate = index_rate
+        self._stages = {}
+        # Where the PLF came from (set by get_principal_limit_factor)
+        self.plf_source = None
 
-        # Load PLF data when initializing
-        self.__class__.load_plf_data()
-
+    @_stage
     def get_principal_limit_factor(self):
         """
-        Get Principal Limit Factor from table or approximation
+        Get Principal Limit Factor from the compiled PLF index or approximation
         """
-        logger.info(
-            f"Calculating principal limit factor for age={self.input_data.age}, rate={self.input_data.interest_rate}")
-
-        try:
-            # First try to find exact match in PLF table from database
-            plf_entry = PLFTable.objects.get(
-                config=self.config,
-                age=self.input_data.age,
-                interest_rate=self.input_data.interest_rate
-            )
-            logger.info(f"Found PLF in database table: {plf_entry.factor}")
-            return plf_entry.factor
-        except PLFTable.DoesNotExist:
-            # Database lookup failed, now try CSV data
-            logger.info("No match in database, checking CSV data...")
-
-            try:
-                # Get the PLF data
-                plf_data = self.__class__._plf_data
-
-                if plf_data is not None and not plf_data.empty:
-                    # Try exact match in the CSV data
-                    exact_match = plf_data[(plf_data['Age'] == self.input_data.age) &
-                                           (abs(plf_data['Rate'] - float(self.input_data.interest_rate)) < 0.001)]
-
-                    if not exact_match.empty:
-                        plf = Decimal(str(exact_match.iloc[0]['PLF']))
-                        logger.info(f"Found exact PLF match in CSV: {plf}")
-                        return plf
-
-                    # If no exact match, find closest
-                    logger.info("No exact match in CSV, finding closest match...")
-
-                    # Filter by age first
-                    age_matches = plf_data[plf_data['Age'] == self.input_data.age]
-
-                    if not age_matches.empty:
-                        # Find closest interest rate
-                        age_matches['rate_diff'] = abs(age_matches['Rate'] - float(self.input_data.interest_rate))
-                        closest_match = age_matches.loc[age_matches['rate_diff'].idxmin()]
-                        plf = Decimal(str(closest_match['PLF']))
-                        logger.info(
-                            f"Found closest PLF in CSV by interest rate: {plf} (rate diff: {closest_match['rate_diff']})")
-                        return plf
-
-                logger.info("No suitable match found in CSV, using approximation formula")
-            except Exception as e:
-                logger.error(f"Error using CSV data: {str(e)}")
-                logger.info("Falling back to approximation formula due to error")
-
-            # Fallback to approximation
-            logger.info("Using approximation formula")
-            base_factor = min(Decimal('0.75'),
-                              (Decimal(str(self.input_data.age)) - Decimal('62')) * Decimal('0.005') + Decimal('0.35'))
-            rate_adjustment = max(Decimal('0'), (self.input_data.interest_rate - Decimal('5.0')) * Decimal('0.1'))
-            result = max(Decimal('0.2'), base_factor - rate_adjustment)
-            logger.info(f"Calculated PLF using approximation: {result}")
-            return result
-
+        start = time.perf_counter()
+        plf, self.plf_source, rate_diff = _resolve_plf(self.config, self.input_data.age, self.input_data.interest_rate)
+        PLF_RESOLUTION_SECONDS.observe(time.perf_counter() - start, self.plf_source)
+        PLF_RESOLUTIONS.inc(self.plf_source)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("PLF for age=%s rate=%s: %s (source %s, rate diff %s)",
+                         self.input_data.age, self.input_data.interest_rate, plf, self.plf_source, rate_diff,
+                         extra={'event': 'plf.resolved'})
+        return plf
+
+    @_stage
+    def get_home_value_terms(self):
+        """Max claim, origination fee and MIP, see home_value_terms()"""
+        return home_value_terms(self.config, self.input_data.home_value)
+
+    @_stage
     def get_max_claim_amount(self):
         """Calculate the maximum claim amount"""
-        return min(self.input_data.home_value, self.config.fha_lending_limit)
+        return self.get_home_value_terms()[0]
 
+    @_stage
     def calculate_origination_fee(self):
         """Calculate origination fee based on tiered structure"""
-        if self.input_data.home_value <= self.config.first_tier_limit:
-            fee = max(
-                self.config.origination_fee_min,
-                self.input_data.home_value * self.config.first_tier_rate
-            )
-        else:
-            fee = (self.config.first_tier_limit * self.config.first_tier_rate +
-                   (self.input_data.home_value - self.config.first_tier_limit) *
-                   self.config.second_tier_rate)
-
-        return min(fee, self.config.origination_fee_cap)
+        return self.get_home_value_terms()[1]
 
+    @_stage
     def calculate_mortgage_insurance_premium(self):
         """Calculate upfront Mortgage Insurance Premium"""
-        return self.get_max_claim_amount() * self.config.mip_rate
+        return self.get_home_value_terms()[2]
 
+    @_stage
     def estimate_other_closing_costs(self):
         """Estimate other closing costs (appraisal, title, etc.)"""
         # Simple estimate - could be made more sophisticated
-        return Decimal('3000.00')
+        return OTHER_CLOSING_COSTS
 
+    @_stage
     def calculate_total_closing_costs(self):
         """Calculate total closing costs"""
         origination_fee = self.calculate_origination_fee()
@@ -192,12 +247,14 @@ class HECMCalculator:
         other_costs = self.estimate_other_closing_costs()
         return origination_fee + mip + other_costs
 
+    @_stage
     def calculate_principal_limit(self):
         """Calculate principal limit"""
         max_claim = self.get_max_claim_amount()
         plf = self.get_principal_limit_factor()
         return max_claim * plf
 
+    @_stage
     def calculate_max_cash_out(self):
         """Calculate maximum cash out available"""
         principal_limit = self.calculate_principal_limit()
@@ -205,20 +262,41 @@ class HECMCalculator:
         max_cash_out = max(Decimal('0'), principal_limit - self.input_data.existing_mortgage - closing_costs)
         return max_cash_out
 
+    def reset(self):
+        """Discard memoized stage results, e.g. after changing input_data or config"""
+        self._stages.clear()
+
     def calculate(self):
         """Perform all calculations and return result object"""
+        # Stages are evaluated in dependency order; each one is memoized, so the
+        # later stages reuse the earlier results instead of recomputing them
+        max_claim_amount = self.get_max_claim_amount()
+        principal_limit_factor = self.get_principal_limit_factor()
+        principal_limit = self.calculate_principal_limit()
+        origination_fee = self.calculate_origination_fee()
+        mortgage_insurance_premium = self.calculate_mortgage_insurance_premium()
+        other_closing_costs = self.estimate_other_closing_costs()
+        total_closing_costs = self.calculate_total_closing_costs()
+        max_cash_out = self.calculate_max_cash_out()
+
+        # One summary record per quote instead of a record per stage
+        logger.info("Quote age=%s home_value=%s rate=%s plf=%s (%s) max_cash_out=%s",
+                    self.input_data.age, self.input_data.home_value, self.input_data.interest_rate,
+                    principal_limit_factor, self.plf_source, max_cash_out,
+                    extra={'event': 'quote.summary'})
+
         # Create a simple dict result since we may not be able to save to the database in this case
         result = {
             "input_data": self.input_data,
             "config_used": self.config,
-            "max_claim_amount": self.get_max_claim_amount(),
-            "principal_limit_factor": self.get_principal_limit_factor(),
-            "principal_limit": self.calculate_principal_limit(),
-            "origination_fee": self.calculate_origination_fee(),
-            "mortgage_insurance_premium": self.calculate_mortgage_insurance_premium(),
-            "other_closing_costs": self.estimate_other_closing_costs(),
-            "total_closing_costs": self.calculate_total_closing_costs(),
-            "max_cash_out": self.calculate_max_cash_out(),
+            "max_claim_amount": max_claim_amount,
+            "principal_limit_factor": principal_limit_factor,
+            "principal_limit": principal_limit,
+            "origination_fee": origination_fee,
+            "mortgage_insurance_premium": mortgage_insurance_premium,
+            "other_closing_costs": other_closing_costs,
+            "total_closing_costs": total_closing_costs,
+            "max_cash_out": max_cash_out,
             "margin": getattr(self.input_data, 'margin', Decimal('2.00')),
             "index_rate": self.index_rate or Decimal('3.50')
         }
@@ -226,7 +304,14 @@ class HECMCalculator:
         return result
 
     def get_result_dict(self):
-        """Calculate and return results as a dictionary"""
+        """Calculate and return results as a dictionary (served from the quote cache when enabled)"""
+        cache = get_quote_cache()
+        if cache is not None:
+            return cache.get_or_compute(self, self._build_result_dict)
+        return self._build_result_dict()
+
+    def _build_result_dict(self):
+        """Calculate the results and convert them to floats"""
         result = self.calculate()
         return {
             "principal_limit": float(result["principal_limit"]),
@@ -237,8 +322,8 @@ class HECMCalculator:
             "mortgage_insurance_premium": float(result["mortgage_insurance_premium"]),
             "other_closing_costs": float(result["other_closing_costs"]),
             "total_closing_costs": float(result["total_closing_costs"]),
-            "margin": float(getattr(self.input_data, 'margin', Decimal('2.00'))),
-            "index_rate": float(self.index_rate or Decimal('3.50')),
+            "margin": float(result["margin"]),
+            "index_rate": float(result["index_rate"]),
             "interest_rate": float(self.input_data.interest_rate)
         }
 
@@ -258,7 +343,8 @@ class HECMCalculator:
 
         # Calculate new interest rate
         new_interest_rate = index_rate + Decimal(str(margin))
-        logger.info(f"Recalculating with new margin: {margin}%, new rate: {new_interest_rate}%")
+        logger.debug("Recalculating with new margin: %s%%, new rate: %s%%", margin, new_interest_rate,
+                     extra={'event': 'quote.recalculate'})
 
         # Create new input data with the updated interest rate
         new_input = {
@@ -275,3 +361,578 @@ class HECMCalculator:
         # Return the results
         return new_calculator.get_result_dict()
 
+    def sweep_margins(self, margins, index_rates=None):
+        """
+        Price a grid of margins, optionally crossed with several index rates
+
+        Max claim, fees, MIP and closing costs do not depend on the rate, so
+        they are computed once; only the PLF, principal limit and cash out are
+        recomputed for each grid point.
+
+        Args:
+            margins: Margin values to price
+            index_rates: Optional index rates (uses instance value if not provided)
+
+        Returns:
+            Dictionary with the rate-independent fields and a compact table
+            ("columns" and "rows") with one row per index rate and margin
+        """
+        if index_rates is None:
+            index_rates = [self.index_rate or Decimal('3.50')]
+
+        margins = _decimal_column(margins, len(margins))
+        index_rates = _decimal_column(index_rates, len(index_rates))
+        size = len(margins) * len(index_rates)
+        logger.info("Sweeping %s margins across %s index rates", len(margins), len(index_rates),
+                    extra={'event': 'quote.sweep'})
+
+        # Rate-independent stages, memoized on this calculator
+        max_claim_amount = self.get_max_claim_amount()
+        total_closing_costs = self.calculate_total_closing_costs()
+
+        # One row per (index rate, margin) pair, index rates varying slowest
+        index_rate = np.repeat(index_rates, len(margins))
+        margin = np.tile(margins, len(index_rates))
+        interest_rate = index_rate + margin
+        age = np.full(size, self.input_data.age, dtype=np.int64)
+
+        principal_limit_factor = _principal_limit_factors(self.config, age, interest_rate)
+        principal_limit = max_claim_amount * principal_limit_factor
+        max_cash_out = principal_limit - self.input_data.existing_mortgage - total_closing_costs
+        max_cash_out = np.where(max_cash_out > 0, max_cash_out, Decimal('0'))
+
+        table = np.column_stack([index_rate, margin, interest_rate, principal_limit_factor,
+                                 principal_limit, max_cash_out]).astype(float)
+        return {
+            "max_claim_amount": float(max_claim_amount),
+            "max_origination_fee": float(self.calculate_origination_fee()),
+            "mortgage_insurance_premium": float(self.calculate_mortgage_insurance_premium()),
+            "other_closing_costs": float(self.estimate_other_closing_costs()),
+            "total_closing_costs": float(total_closing_costs),
+            "columns": list(SWEEP_COLUMNS),
+            "rows": table.tolist()
+        }
+
+    def project(self, months=360, plan=PLAN_LINE_OF_CREDIT, term_months=None, lump_sum=0, **options):
+        """
+        Project the monthly loan balance and line of credit of this quote
+
+        Args:
+            months: Number of months to project
+            plan: Payment plan ('line_of_credit', 'tenure' or 'term')
+            term_months: Number of monthly payments of the term plan
+            lump_sum: Draw at closing
+            **options: Forwarded to project_loans (annual_mip_rate, series, dtype)
+
+        Returns:
+            project_loans() result for this single loan (one row per series)
+        """
+        return project_loans(
+            [self.input_data.age], [self.calculate_principal_limit()], [self.input_data.interest_rate],
+            [self.calculate_total_closing_costs()], [self.input_data.existing_mortgage],
+            months=months, plan=plan, term_months=term_months, lump_sum=lump_sum, **options)
+
+    def _net_cash(self, home_value, plf, existing_mortgage=None):
+        """Cash left after the payoff and closing costs (negative when the loan falls short)"""
+        if existing_mortgage is None:
+            existing_mortgage = self.input_data.existing_mortgage
+        max_claim, origination_fee, mip = home_value_terms(self.config, home_value)
+        closing_costs = origination_fee + mip + self.estimate_other_closing_costs()
+        return max_claim * plf - existing_mortgage - closing_costs
+
+    def solve_home_value(self, cash_out=Decimal('0')):
+        """
+        Minimum home value that nets at least cash_out, keeping this quote's other inputs
+
+        The PLF doesn't depend on the home value, and below the lending limit
+        the net cash is linear between the breakpoints of the fee tiers, so
+        each segment is solved in closed form. Above the limit the max claim
+        is capped while the fee still grows, so more value never helps.
+
+        Args:
+            cash_out: Cash wanted after the payoff and closing costs
+
+        Returns:
+            Home value in whole cents, or None when no home value nets cash_out
+        """
+        cash_out = Decimal(str(cash_out))
+        plf = self.get_principal_limit_factor()
+        limit = self.config.fha_lending_limit
+        points = sorted({Decimal('0'), limit} | {point for point in home_value_breakpoints(self.config)
+                                                  if 0 < point < limit})
+
+        for low, high in zip(points, points[1:]):
+            # Linear on (low, high]: two interior points give the line
+            first, second = low + (high - low) / 3, low + (high - low) * 2 / 3
+            at_first = self._net_cash(first, plf)
+            slope = (self._net_cash(second, plf) - at_first) / (second - first)
+            just_above_low = at_first + slope * (low - first)
+            if max(just_above_low, self._net_cash(high, plf)) < cash_out:
+                continue
+            if just_above_low >= cash_out:
+                home_value = low
+            else:
+                home_value = first + (cash_out - at_first) / slope
+            cent = Decimal('0.01')
+            home_value = max(home_value.quantize(cent, rounding=ROUND_CEILING), low + cent)
+            # Rounding of the closed-form step can leave it a cent off either way
+            while home_value - cent > low and self._net_cash(home_value - cent, plf) >= cash_out:
+                home_value -= cent
+            while home_value <= high and self._net_cash(home_value, plf) < cash_out:
+                home_value += cent
+            if home_value <= high:
+                return home_value
+        return None
+
+    def solve_max_payoff(self, cash_out=Decimal('0')):
+        """
+        Largest existing mortgage this quote can pay off while still netting cash_out
+
+        Returns:
+            Mortgage balance in whole cents, or None when even no mortgage falls short
+        """
+        payoff = self._net_cash(self.input_data.home_value, self.get_principal_limit_factor(),
+                                existing_mortgage=Decimal('0')) - Decimal(str(cash_out))
+        if payoff < 0:
+            return None
+        return payoff.quantize(Decimal('0.01'), rounding=ROUND_FLOOR)
+
+    def solve_min_age(self, cash_out=Decimal('0')):
+        """
+        Minimum borrower age at which this property nets at least cash_out
+
+        PLFs grow with age, so the ages from config.min_age to SOLVER_MAX_AGE
+        are bisected, with one PLF lookup per probed age.
+
+        Returns:
+            Age, or None when no age up to SOLVER_MAX_AGE qualifies
+        """
+        cash_out = Decimal(str(cash_out))
+        home_value = self.input_data.home_value
+        rate = self.input_data.interest_rate
+
+        def qualifies(age):
+            return self._net_cash(home_value, _resolve_plf(self.config, age, rate)[0]) >= cash_out
+
+        ages = range(self.config.min_age, SOLVER_MAX_AGE + 1)
+        i = bisect_left(ages, True, key=qualifies)
+        return ages[i] if i < len(ages) else None
+
+    @classmethod
+    def calculate_many(cls, age, home_value, interest_rate=None, margin=None, index_rate=None,
+                       existing_mortgage=None, config=None, as_of=None, numeric=NUMERIC_DECIMAL, audit=0,
+                       as_decimal=False):
+        """
+        Vectorized calculate() for many borrowers against a single config
+
+        Inputs are columns (sequences or NumPy arrays) of equal length and are
+        normalized the same way as the dict input of the constructor.
+
+        The numeric mode selects the arithmetic:
+            decimal: Decimal object arrays; every value matches the scalar path exactly
+            cents: int64 fixed point (currency scaled by CURRENCY_SCALE, rates and
+                   factors by RATIO_SCALE); the currency fields are rounded half up
+                   to whole cents
+            float: float64 throughout, for exploratory batches
+
+        Args:
+            age: Ages of the youngest borrowers
+            home_value: Appraised home values
+            interest_rate: Optional expected interest rates
+            margin: Optional lender margins
+            index_rate: Optional index rate, either one value or a column
+            existing_mortgage: Optional existing mortgage balances (default 0)
+            config: Optional HECMConfig instance (uses latest by default)
+            as_of: Optional date; uses the config in effect on that date instead of the latest
+            numeric: Numeric mode ('decimal', 'cents' or 'float')
+            audit: Number of rows to re-run with Decimal arithmetic and compare at cent level
+            as_decimal: Return the Decimal object arrays of the decimal mode instead of float64
+
+        Returns:
+            Dictionary with the get_result_dict() fields as float64 arrays (Decimal
+            arrays with as_decimal), plus an "audit" report (see _audit_many) when
+            audit is requested
+        """
+        if numeric not in NUMERIC_MODES:
+            raise ValueError(f"Unknown numeric mode {numeric!r} (choose from {', '.join(NUMERIC_MODES)})")
+        if as_decimal and numeric != NUMERIC_DECIMAL:
+            raise ValueError("as_decimal requires the decimal numeric mode")
+        config = config or _resolve_config(as_of)
+        columns = (age, home_value, interest_rate, margin, index_rate, existing_mortgage)
+
+        if numeric == NUMERIC_DECIMAL:
+            results = _calculate_many_decimal(config, *columns, as_decimal=as_decimal)
+        else:
+            results = _calculate_many_fast(config, numeric, *columns)
+
+        if audit:
+            results['audit'] = _audit_many(config, columns, results, audit)
+        return results
+
+
+def _resolve_plf(config, age, interest_rate):
+    """(factor, source, rate_diff) from the config's PLF index, or the approximation when it has no entry"""
+    match = get_plf_index(config).lookup(age, interest_rate)
+    if match is not None:
+        return match
+    return _approximate_plf(Decimal(str(age)), interest_rate), SOURCE_APPROXIMATION, None
+
+
+def home_value_terms(config, home_value):
+    """
+    The parts of a quote that depend on the home value: max claim, origination fee and MIP
+
+    The one implementation of the lending limit and fee tiers, used by the
+    calculator stages, the Decimal path of calculate_many and repricing.
+    """
+    max_claim = min(home_value, config.fha_lending_limit)
+    if home_value <= config.first_tier_limit:
+        fee = max(config.origination_fee_min, home_value * config.first_tier_rate)
+    else:
+        fee = (config.first_tier_limit * config.first_tier_rate +
+               (home_value - config.first_tier_limit) * config.second_tier_rate)
+    fee = min(fee, config.origination_fee_cap)
+    return max_claim, fee, max_claim * config.mip_rate
+
+
+def home_value_breakpoints(config):
+    """Home values where one of the home_value_terms() changes slope or jumps"""
+    points = [config.fha_lending_limit, config.first_tier_limit]
+    if config.first_tier_rate > 0:
+        points += [config.origination_fee_min / config.first_tier_rate,
+                   config.origination_fee_cap / config.first_tier_rate]
+    if config.second_tier_rate > 0:
+        points.append(config.first_tier_limit + (config.origination_fee_cap -
+                                                 config.first_tier_limit * config.first_tier_rate) /
+                      config.second_tier_rate)
+    return points
+
+
+def _resolve_config(as_of=None):
+    """Return the config in effect on as_of, or the latest config"""
+    if as_of is None:
+        return HECMConfig.get_current()
+    return HECMConfig.get_effective(as_of)
+
+
+def _calculate_many_decimal(config, age, home_value, interest_rate=None, margin=None, index_rate=None,
+                            existing_mortgage=None, as_decimal=False):
+    """Decimal arithmetic of HECMCalculator.calculate_many (the reference path)"""
+    age = np.asarray(age, dtype=np.int64)
+    size = len(age)
+    home_value = _decimal_column(home_value, size)
+    existing_mortgage = _decimal_column(existing_mortgage, size, Decimal('0.00'))
+    interest_rate = _decimal_column(interest_rate, size)
+    margin = _decimal_column(margin, size)
+    index_rate = _decimal_column(index_rate, size)
+
+    # Resolve rate and margin like the constructor does for dict input
+    if margin is not None and interest_rate is None:
+        if index_rate is None:
+            index_rate = _decimal_column(Decimal('3.50'), size)
+        interest_rate = index_rate + margin
+    elif interest_rate is not None and margin is None and index_rate is not None:
+        margin = interest_rate - index_rate
+    elif margin is None:
+        margin = _decimal_column(Decimal('2.00'), size)
+    if interest_rate is None:
+        raise ValueError("Either interest_rate or margin is required")
+
+    logger.info("Calculating %s HECM quotes with config %s", size, config.pk, extra={'event': 'quote.batch'})
+
+    # Max claim, fees and MIP
+    max_claim_amount, origination_fee, mortgage_insurance_premium = np.frompyfunc(
+        lambda value: home_value_terms(config, value), 1, 3)(home_value)
+    other_closing_costs = _decimal_column(OTHER_CLOSING_COSTS, size)
+    total_closing_costs = origination_fee + mortgage_insurance_premium + other_closing_costs
+
+    principal_limit_factor = _principal_limit_factors(config, age, interest_rate)
+
+    # Principal limit and cash out
+    principal_limit = max_claim_amount * principal_limit_factor
+    max_cash_out = principal_limit - existing_mortgage - total_closing_costs
+    max_cash_out = np.where(max_cash_out > 0, max_cash_out, Decimal('0'))
+
+    if index_rate is None:
+        index_rate = _decimal_column(Decimal('3.50'), size)
+    else:
+        index_rate = np.where(index_rate != 0, index_rate, Decimal('3.50'))
+
+    results = {
+        "principal_limit": principal_limit,
+        "max_cash_out": max_cash_out,
+        "max_origination_fee": origination_fee,
+        "max_claim_amount": max_claim_amount,
+        "principal_limit_factor": principal_limit_factor,
+        "mortgage_insurance_premium": mortgage_insurance_premium,
+        "other_closing_costs": other_closing_costs,
+        "total_closing_costs": total_closing_costs,
+        "margin": margin,
+        "index_rate": index_rate,
+        "interest_rate": interest_rate
+    }
+    if as_decimal:
+        return results
+    return {key: column.astype(float) for key, column in results.items()}
+
+
+def _calculate_many_fast(config, numeric, age, home_value, interest_rate=None, margin=None, index_rate=None,
+                         existing_mortgage=None):
+    """int64 fixed-point ('cents') or float64 ('float') arithmetic of HECMCalculator.calculate_many"""
+    age = np.asarray(age, dtype=np.int64)
+    size = len(age)
+
+    # Rates are resolved as scaled integers in both modes, so that e.g. 3.1 + 2.2
+    # converts to the same float as the table's 5.3 and finds its exact entry
+    interest_rate = _scaled_column(interest_rate, size, RATIO_SCALE)
+    margin = _scaled_column(margin, size, RATIO_SCALE)
+    index_rate = _scaled_column(index_rate, size, RATIO_SCALE)
+    default_index_rate = _scaled('3.50', RATIO_SCALE)
+    if margin is not None and interest_rate is None:
+        if index_rate is None:
+            index_rate = np.full(size, default_index_rate, dtype=np.int64)
+        interest_rate = index_rate + margin
+    elif interest_rate is not None and margin is None and index_rate is not None:
+        margin = interest_rate - index_rate
+    elif margin is None:
+        margin = np.full(size, _scaled('2.00', RATIO_SCALE), dtype=np.int64)
+    if interest_rate is None:
+        raise ValueError("Either interest_rate or margin is required")
+    if index_rate is None:
+        index_rate = np.full(size, default_index_rate, dtype=np.int64)
+    else:
+        index_rate = np.where(index_rate != 0, index_rate, default_index_rate)
+
+    logger.info("Calculating %s HECM quotes with config %s (%s arithmetic)", size, config.pk, numeric,
+                extra={'event': 'quote.batch'})
+
+    rate = interest_rate / RATIO_SCALE
+    factors, sources = get_plf_index(config).lookup_many(age, rate, decimal=False)
+    missing = np.isnan(factors)
+    if missing.any():
+        factors[missing] = _approximate_plf_float(age[missing], rate[missing])
+        sources[missing] = SOURCE_APPROXIMATION
+    _count_plf_sources(sources)
+
+    if numeric == NUMERIC_CENTS:
+        results = _currency_cents(config, home_value, existing_mortgage, factors, size)
+    else:
+        results = _currency_float(config, home_value, existing_mortgage, factors, size)
+
+    results.update({
+        "principal_limit_factor": factors,
+        "margin": margin / RATIO_SCALE,
+        "index_rate": index_rate / RATIO_SCALE,
+        "interest_rate": rate
+    })
+    return results
+
+
+def _currency_cents(config, home_value, existing_mortgage, factors, size):
+    """Currency fields in int64 CURRENCY_SCALE units, returned in whole cents; factors are rounded to RATIO_SCALE"""
+    home_value = _scaled_column(home_value, size, CURRENCY_SCALE)
+    existing_mortgage = _scaled_column(existing_mortgage, size, CURRENCY_SCALE, 0)
+    fha_lending_limit = _scaled(config.fha_lending_limit, CURRENCY_SCALE)
+    first_tier_limit = _scaled(config.first_tier_limit, CURRENCY_SCALE)
+    first_tier_rate = _scaled(config.first_tier_rate, RATIO_SCALE)
+
+    max_claim_amount = np.minimum(home_value, fha_lending_limit)
+    origination_fee = np.where(
+        home_value <= first_tier_limit,
+        np.maximum(_mul_ratio(home_value, first_tier_rate), _scaled(config.origination_fee_min, CURRENCY_SCALE)),
+        _mul_ratio(first_tier_limit, first_tier_rate) +
+        _mul_ratio(home_value - first_tier_limit, _scaled(config.second_tier_rate, RATIO_SCALE))
+    )
+    origination_fee = np.minimum(origination_fee, _scaled(config.origination_fee_cap, CURRENCY_SCALE))
+    mortgage_insurance_premium = _mul_ratio(max_claim_amount, _scaled(config.mip_rate, RATIO_SCALE))
+    other_closing_costs = np.full(size, _scaled(OTHER_CLOSING_COSTS, CURRENCY_SCALE), dtype=np.int64)
+    total_closing_costs = origination_fee + mortgage_insurance_premium + other_closing_costs
+
+    principal_limit = _mul_ratio(max_claim_amount, np.rint(factors * RATIO_SCALE).astype(np.int64))
+    max_cash_out = np.maximum(principal_limit - existing_mortgage - total_closing_costs, 0)
+
+    return {
+        "principal_limit": _to_cents(principal_limit),
+        "max_cash_out": _to_cents(max_cash_out),
+        "max_origination_fee": _to_cents(origination_fee),
+        "max_claim_amount": _to_cents(max_claim_amount),
+        "mortgage_insurance_premium": _to_cents(mortgage_insurance_premium),
+        "other_closing_costs": _to_cents(other_closing_costs),
+        "total_closing_costs": _to_cents(total_closing_costs)
+    }
+
+
+def _currency_float(config, home_value, existing_mortgage, factors, size):
+    """Currency fields in float64"""
+    home_value = _float_column(home_value, size)
+    existing_mortgage = _float_column(existing_mortgage, size, 0.0)
+    fha_lending_limit = float(config.fha_lending_limit)
+    first_tier_limit = float(config.first_tier_limit)
+    first_tier_rate = float(config.first_tier_rate)
+
+    max_claim_amount = np.minimum(home_value, fha_lending_limit)
+    origination_fee = np.where(
+        home_value <= first_tier_limit,
+        np.maximum(home_value * first_tier_rate, float(config.origination_fee_min)),
+        first_tier_limit * first_tier_rate + (home_value - first_tier_limit) * float(config.second_tier_rate)
+    )
+    origination_fee = np.minimum(origination_fee, float(config.origination_fee_cap))
+    mortgage_insurance_premium = max_claim_amount * float(config.mip_rate)
+    other_closing_costs = np.full(size, float(OTHER_CLOSING_COSTS))
+    total_closing_costs = origination_fee + mortgage_insurance_premium + other_closing_costs
+
+    principal_limit = max_claim_amount * factors
+    max_cash_out = np.maximum(principal_limit - existing_mortgage - total_closing_costs, 0.0)
+
+    return {
+        "principal_limit": principal_limit,
+        "max_cash_out": max_cash_out,
+        "max_origination_fee": origination_fee,
+        "max_claim_amount": max_claim_amount,
+        "mortgage_insurance_premium": mortgage_insurance_premium,
+        "other_closing_costs": other_closing_costs,
+        "total_closing_costs": total_closing_costs
+    }
+
+
+def _audit_many(config, columns, results, sample, seed=0):
+    """
+    Re-run a sample of a calculate_many batch with Decimal arithmetic
+
+    Args:
+        config: HECMConfig the batch was priced with
+        columns: The (age, home_value, interest_rate, margin, index_rate, existing_mortgage) inputs
+        results: Results of the batch
+        sample: Number of rows to re-run (chosen with a fixed seed)
+
+    Returns:
+        Dictionary with the number of sampled rows, the number of rows where
+        a currency field is off by a cent or more, the largest difference in
+        cents, the number of divergent rows per field and up to AUDIT_EXAMPLES
+        divergent values next to their Decimal reference
+    """
+    size = len(results['max_cash_out'])
+    count = min(int(sample), size)
+    rows = np.sort(np.random.default_rng(seed).choice(size, count, replace=False))
+    reference = _calculate_many_decimal(config, *(_take(column, rows) for column in columns))
+
+    divergent = np.zeros(count, dtype=bool)
+    fields = {}
+    examples = []
+    max_cents = 0.0
+    for field in CURRENCY_FIELDS:
+        cents = np.abs(results[field][rows] - reference[field]) * 100
+        # Sub-cent differences are rounding noise, not divergence
+        mismatched = cents >= 1 - 1e-6
+        if not mismatched.any():
+            continue
+        fields[field] = int(mismatched.sum())
+        max_cents = max(max_cents, round(float(cents.max()), 2))
+        divergent |= mismatched
+        for i in np.flatnonzero(mismatched)[:AUDIT_EXAMPLES - len(examples)]:
+            examples.append({
+                'row': int(rows[i]),
+                'field': field,
+                'value': float(results[field][rows[i]]),
+                'reference': float(reference[field][i])
+            })
+
+    if divergent.any():
+        logger.warning("Numeric audit: %s of %s sampled rows differ from Decimal by up to %s cents",
+                       int(divergent.sum()), count, max_cents, extra={'event': 'quote.audit'})
+    return {
+        'sampled': count,
+        'divergent': int(divergent.sum()),
+        'max_cents': max_cents,
+        'fields': fields,
+        'examples': examples
+    }
+
+
+def _take(column, rows):
+    """Select rows of a calculate_many input column (single values apply to every row)"""
+    if column is None or isinstance(column, (str, Decimal)) or np.isscalar(column):
+        return column
+    return np.asarray(column, dtype=object)[rows]
+
+
+def _scaled(value, scale):
+    """Round a decimal value times scale to an int, half up"""
+    return int((Decimal(str(value)) * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def _scaled_column(values, size, scale, default=None):
+    """Convert a column (or a single value) to an int64 array of values * scale"""
+    if values is None:
+        if default is None:
+            return None
+        values = default
+    if isinstance(values, (str, Decimal)) or np.isscalar(values):
+        return np.full(size, _scaled(values, scale), dtype=np.int64)
+    return np.rint(np.asarray(values, dtype=float) * scale).astype(np.int64)
+
+
+def _float_column(values, size, default=None):
+    """Convert a column (or a single value) to a float64 array of the given size"""
+    if values is None:
+        values = default
+    if isinstance(values, (str, Decimal)) or np.isscalar(values):
+        return np.full(size, float(values))
+    return np.asarray(values, dtype=float)
+
+
+def _mul_ratio(amount, ratio):
+    """Multiply a fixed-point amount by a RATIO_SCALE fixed-point ratio, rounding half up"""
+    return (amount * ratio + RATIO_SCALE // 2) // RATIO_SCALE
+
+
+def _to_cents(amount):
+    """Round CURRENCY_SCALE fixed-point amounts half up to whole cents, as float64 dollars"""
+    step = CURRENCY_SCALE // 100
+    return ((amount + step // 2) // step) / 100
+
+
+def _decimal_column(values, size, default=None):
+    """Convert a column (or a single value) to a Decimal object array of the given size"""
+    if values is None:
+        if default is None:
+            return None
+        values = default
+    column = np.empty(size, dtype=object)
+    if isinstance(values, (str, Decimal)) or np.isscalar(values):
+        column[:] = Decimal(str(values))
+    else:
+        column[:] = [Decimal(str(value)) for value in values]
+    return column
+
+
+def _principal_limit_factors(config, age, interest_rate):
+    """Vectorized get_principal_limit_factor(): PLF index lookup with the approximation as fallback"""
+    factors, sources = get_plf_index(config).lookup_many(age, interest_rate)
+    missing = np.equal(factors, None)
+    if missing.any():
+        factors[missing] = _approximate_plf(
+            _decimal_column(age[missing].tolist(), int(missing.sum())), interest_rate[missing])
+        sources[missing] = SOURCE_APPROXIMATION
+    _count_plf_sources(sources)
+    return factors
+
+
+def _count_plf_sources(sources):
+    """Add a batch's PLF sources to the resolution counters"""
+    for source, count in zip(*np.unique(sources.astype(str), return_counts=True)):
+        PLF_RESOLUTIONS.inc(str(source), amount=int(count))
+
+
+def _approximate_plf(age, interest_rate):
+    """Approximation formula used when the PLF index has no entry for an age (Decimal or Decimal arrays)"""
+    base_factor = np.minimum(Decimal('0.75'), (age - Decimal('62')) * Decimal('0.005') + Decimal('0.35'))
+    rate_adjustment = np.maximum(Decimal('0'), (interest_rate - Decimal('5.0')) * Decimal('0.1'))
+    return np.maximum(Decimal('0.2'), base_factor - rate_adjustment)
+
+
+def _approximate_plf_float(age, interest_rate):
+    """float64 version of _approximate_plf"""
+    base_factor = np.minimum(0.75, (age - 62) * 0.005 + 0.35)
+    rate_adjustment = np.maximum(0.0, (interest_rate - 5.0) * 0.1)
+    return np.maximum(0.2, base_factor - rate_adjustment)
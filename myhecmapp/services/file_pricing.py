@@ -0,0 +1,277 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+import csv
+import io
+import itertools
+import json
+import os
+
+# Input columns; age, home_value and one of interest_rate or margin are required
+INPUT_COLUMNS = ('age', 'home_value', 'interest_rate', 'margin', 'index_rate', 'existing_mortgage')
+
+_worker_config = None
+
+
+def init_worker(config_pk=None):
+    """
+    Process pool initializer: resolve the config and load its PLF index once per worker
+
+    Works for forked and spawned workers; a spawned worker sets Django up first.
+    """
+    global _worker_config
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Imported here so the module can be imported by a worker before Django is set up
+    from ..models.config import HECMConfig
+    from .plf_index import get_plf_index
+
+    config = HECMConfig.objects.get(pk=config_pk) if config_pk else HECMConfig.get_current()
+    get_plf_index(config)
+    _worker_config = config
+
+
+def _parse(row):
+    """Convert one input row to calculate_many() values; missing or empty values are None, non-finite ones rejected"""
+    values = {}
+    for name in INPUT_COLUMNS:
+        raw = (row.get(name) or '').strip()
+        if not raw:
+            values[name] = None
+        elif name == 'age':
+            values[name] = int(raw)
+        else:
+            values[name] = Decimal(raw)
+            if not values[name].is_finite():
+                raise ValueError(f"{name} must be a finite number")
+    if values['age'] is None or values['home_value'] is None:
+        raise ValueError("age and home_value are required")
+    if values['interest_rate'] is None and values['margin'] is None:
+        raise ValueError("interest_rate or margin is required")
+    return values
+
+
+def output_header(header):
+    """
+    Output columns: the input columns, the get_result_dict() fields not among them and "error"
+
+    Input columns named like a result field (margin, index_rate,
+    interest_rate) carry the value the calculator resolved.
+    """
+    from .calculator import RESULT_COLUMNS
+    return list(header) + [name for name in RESULT_COLUMNS if name not in header] + ['error']
+
+
+def price_chunk(header, rows, config=None):
+    """
+    Price one chunk of input rows and return it as CSV text
+
+    Rows are grouped by which optional columns they fill, so each group is
+    priced by HECMCalculator.calculate_many() with the same rate and margin
+    resolution as the constructor uses for that row. A group that fails is
+    re-priced row by row, so only the failing rows get an error. The
+    results are the get_result_dict() fields, formatted like the JSON API
+    formats them.
+
+    Args:
+        header: Input column names
+        rows: Lists of raw values, in input order
+        config: HECMConfig (defaults to the worker's config)
+
+    Returns:
+        (csv_text, row_count, error_count) tuple
+    """
+    from .calculator import RESULT_COLUMNS, HECMCalculator
+
+    config = config or _worker_config
+    parsed = []
+    errors = {}
+    for i, raw in enumerate(rows):
+        try:
+            parsed.append((i, _parse(dict(zip(header, raw)))))
+        except (InvalidOperation, ValueError) as e:
+            errors[i] = str(e) or type(e).__name__
+
+    def pattern(item):
+        return tuple(item[1][name] is None for name in ('interest_rate', 'margin', 'index_rate', 'existing_mortgage'))
+
+    def price(group):
+        columns = {name: [values[name] for _, values in group] for name in INPUT_COLUMNS}
+        for name in ('interest_rate', 'margin', 'index_rate', 'existing_mortgage'):
+            if columns[name][0] is None:
+                columns[name] = None
+        priced = HECMCalculator.calculate_many(config=config, **columns)
+        for position, (i, _) in enumerate(group):
+            results[i] = [repr(float(priced[name][position])) for name in RESULT_COLUMNS]
+
+    results = {}
+    for _, group in itertools.groupby(sorted(parsed, key=pattern), key=pattern):
+        group = list(group)
+        try:
+            price(group)
+        except (ArithmeticError, ValueError) as e:
+            if len(group) == 1:
+                errors[group[0][0]] = str(e) or type(e).__name__
+                continue
+            # One bad row fails the whole group: find it by pricing the rows one at a time
+            for item in group:
+                try:
+                    price([item])
+                except (ArithmeticError, ValueError) as e:
+                    errors[item[0]] = str(e) or type(e).__name__
+
+    # Where each result field goes: over an input column of the same name or appended
+    positions = [header.index(name) if name in header else None for name in RESULT_COLUMNS]
+    extra = [''] * sum(position is None for position in positions)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    for i, raw in enumerate(rows):
+        row = list(raw)
+        row += [''] * (len(header) - len(row))
+        appended = list(extra)
+        if i in results:
+            appended = []
+            for position, value in zip(positions, results[i]):
+                if position is None:
+                    appended.append(value)
+                else:
+                    row[position] = value
+        writer.writerow(row[:len(header)] + appended + [errors.get(i, '')])
+    return out.getvalue(), len(rows), len(errors)
+
+
+def _price_in_worker(header, rows):
+    return price_chunk(header, rows)
+
+
+def _read_chunks(reader, chunk_size):
+    while True:
+        chunk = list(itertools.islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Checkpoint:
+    """
+    Resume point of a file pricing run, stored next to the output file
+
+    Records how many input rows are fully written and the output size at
+    that point; the input's size and mtime guard against resuming with a
+    different file.
+    """
+
+    def __init__(self, output_path):
+        self.path = f'{output_path}.progress'
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def price_file(input_path, output_path, chunk_size=10000, workers=1, config=None, resume=False,
+               progress=None):
+    """
+    Stream an input CSV through the calculator into an output CSV in input order
+
+    Chunks are fanned out to a process pool with a bounded number in flight,
+    and written as soon as the oldest pending chunk is done, so memory stays
+    bounded by (workers * 2) chunks. After every written chunk the output is
+    flushed and a checkpoint saved; with resume=True a run continues after
+    the last checkpoint.
+
+    Args:
+        input_path: CSV with INPUT_COLUMNS (extra columns are copied through)
+        output_path: Output CSV with the output_header() columns
+        chunk_size: Rows per chunk
+        workers: Worker processes (1 prices in this process)
+        config: HECMConfig to price with (defaults to the current config)
+        resume: Continue an interrupted run instead of starting over
+        progress: Optional callable receiving (rows_done, errors) after each chunk
+
+    Returns:
+        (rows, errors) tuple for this run
+    """
+    from django.db import connections
+
+    checkpoint = Checkpoint(output_path)
+    stat = os.stat(input_path)
+    state = {'input': os.path.abspath(input_path), 'input_size': stat.st_size, 'input_mtime': stat.st_mtime,
+             'chunk_size': chunk_size, 'rows': 0, 'errors': 0, 'output_size': 0}
+    if resume:
+        previous = checkpoint.load()
+        if previous is None:
+            raise ValueError(f"No checkpoint to resume next to {output_path}")
+        if any(previous.get(key) != state[key] for key in ('input', 'input_size', 'input_mtime')):
+            raise ValueError("The input file changed since the interrupted run")
+        state.update(rows=previous['rows'], errors=previous['errors'], output_size=previous['output_size'])
+
+    with open(input_path, newline='') as source:
+        reader = csv.reader(source)
+        header = next(reader, None)
+        if not header or 'age' not in header or 'home_value' not in header:
+            raise ValueError("The input needs a header with at least age and home_value")
+        # Rows already priced by the interrupted run
+        for _ in itertools.islice(reader, state['rows']):
+            pass
+
+        with open(output_path, 'r+b' if resume else 'wb') as output:
+            if resume:
+                # Drop whatever was written after the last checkpoint
+                output.truncate(state['output_size'])
+                output.seek(state['output_size'])
+            else:
+                line = io.StringIO()
+                csv.writer(line, lineterminator='\n').writerow(output_header(header))
+                output.write(line.getvalue().encode())
+
+            def write(text, count, errors):
+                output.write(text.encode())
+                output.flush()
+                os.fsync(output.fileno())
+                state['rows'] += count
+                state['errors'] += errors
+                state['output_size'] = output.tell()
+                checkpoint.save(state)
+                if progress:
+                    progress(state['rows'], state['errors'])
+
+            chunks = _read_chunks(reader, chunk_size)
+            rows_before, errors_before = state['rows'], state['errors']
+            if workers <= 1:
+                from ..models.config import HECMConfig
+                config = config or HECMConfig.get_current()
+                for chunk in chunks:
+                    write(*price_chunk(header, chunk, config))
+            else:
+                # Forked workers must not share the parent's database connections
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                         initargs=(config.pk if config else None,)) as executor:
+                    pending = deque()
+                    for chunk in chunks:
+                        pending.append(executor.submit(_price_in_worker, header, chunk))
+                        if len(pending) >= workers * 2:
+                            write(*pending.popleft().result())
+                    while pending:
+                        write(*pending.popleft().result())
+
+    checkpoint.remove()
+    return state['rows'] - rows_before, state['errors'] - errors_before
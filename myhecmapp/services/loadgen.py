@@ -0,0 +1,284 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from django.urls import resolve
+from .bench import percentile
+from .metrics import REQUEST_DB_QUERIES
+import asyncio
+import io
+import json
+import random
+import sys
+import time
+
+# Scenario profiles of the default traffic mix
+PROFILES = ('typical', 'jumbo', 'off_grid', 'repeat')
+DEFAULT_MIX = 'typical=70,jumbo=10,off_grid=10,repeat=10'
+
+# Number of distinct scenarios the "repeat" profile draws from (quote cache hits)
+REPEAT_POOL = 20
+
+
+def parse_mix(text):
+    """
+    Parse a traffic mix such as "typical=70,jumbo=30" into {profile: weight}
+
+    Raises:
+        ValueError: For an unknown profile or a weight that is not a positive number
+    """
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in PROFILES:
+            raise ValueError(f"Unknown profile {name!r} (choose from {', '.join(PROFILES)})")
+        mix[name] = float(weight or 1)
+        if mix[name] <= 0:
+            raise ValueError(f"Weight of {name} must be positive")
+    if not mix:
+        raise ValueError("The mix needs at least one profile")
+    return mix
+
+
+def generate_scenarios(count, mix, seed=42):
+    """
+    Draw form-encoded request bodies following a traffic mix
+
+    Profiles:
+        typical: ages 62-85, homes under the FHA limit, rates on the 1/8 grid
+        jumbo: homes above the FHA lending limit
+        off_grid: rates between the table rates (nearest-rate PLF lookups)
+        repeat: a small pool of identical scenarios (quote cache hits)
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    def scenario(profile, rng):
+        rate = 4.5 + 0.125 * rng.randrange(21)
+        data = {
+            'age': rng.randint(62, 85),
+            'home_value': rng.randrange(150000, 800000, 1000),
+            'interest_rate': f'{rate:.3f}',
+            'existing_mortgage': rng.randrange(0, 150000, 5000),
+        }
+        if profile == 'jumbo':
+            data['home_value'] = rng.randrange(1300000, 4000000, 5000)
+        elif profile == 'off_grid':
+            data['interest_rate'] = f'{rate + 0.01 * rng.randint(1, 12):.3f}'
+        return urlencode(data).encode()
+
+    pool_rng = random.Random(seed + 1)
+    pool = [scenario('typical', pool_rng) for _ in range(REPEAT_POOL)]
+    bodies = []
+    for profile in rng.choices(names, weights, k=count):
+        bodies.append(rng.choice(pool) if profile == 'repeat' else scenario(profile, rng))
+    return bodies
+
+
+class LoadHarness:
+    """
+    Drive the project's WSGI or ASGI application in-process
+
+    Requests go through the complete Django stack (middleware, CSRF, form
+    parsing and the view), but never through a socket. A CSRF token is
+    fetched once with a GET of the form page, as a browser would.
+    """
+
+    def __init__(self, path='/hecm/calculate/', host='localhost'):
+        self.path = path
+        self.host = host
+        self.view = resolve(path).url_name
+        self.cookie = ''
+        self.token = ''
+
+    # WSGI
+
+    def _environ(self, method, body=b''):
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': self.path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': self.host,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if method == 'POST':
+            environ.update({
+                'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+                'CONTENT_LENGTH': str(len(body)),
+                'HTTP_COOKIE': self.cookie,
+                'HTTP_X_CSRFTOKEN': self.token,
+            })
+        return environ
+
+    def wsgi_request(self, app, method='POST', body=b''):
+        """Send one request to a WSGI app and return (status, headers, body)"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        result = app(self._environ(method, body), start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            # close() sends request_finished, which releases the DB connection
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], content
+
+    def prime_wsgi(self, app):
+        """Fetch the form page to get a CSRF cookie"""
+        _, headers, _ = self.wsgi_request(app, 'GET')
+        self._store_csrf(headers)
+
+    def run_wsgi(self, app, bodies, concurrency):
+        """Send every body from concurrency threads; returns (elapsed, latencies, errors)"""
+        def send(body):
+            started = time.perf_counter()
+            status, _, content = self.wsgi_request(app, 'POST', body)
+            return time.perf_counter() - started, self._failed(status, content)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, bodies))
+        return time.perf_counter() - started, [latency for latency, _ in outcomes], sum(
+            failed for _, failed in outcomes)
+
+    # ASGI
+
+    def _scope(self, method, body=b''):
+        headers = [(b'host', self.host.encode())]
+        if method == 'POST':
+            headers += [
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(body)).encode()),
+                (b'cookie', self.cookie.encode()),
+                (b'x-csrftoken', self.token.encode()),
+            ]
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': self.path,
+            'raw_path': self.path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': (self.host, 80),
+        }
+
+    async def asgi_request(self, app, method='POST', body=b''):
+        """Send one request to an ASGI app and return (status, headers, body)"""
+        response = {'body': []}
+        done = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # The client stays connected until the response is complete
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = [(k.decode('latin-1'), v.decode('latin-1'))
+                                       for k, v in message.get('headers', [])]
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+                if not message.get('more_body'):
+                    done.set()
+
+        await app(self._scope(method, body), receive, send)
+        done.set()
+        return response['status'], response['headers'], b''.join(response['body'])
+
+    def prime_asgi(self, app):
+        _, headers, _ = asyncio.run(self.asgi_request(app, 'GET'))
+        self._store_csrf(headers)
+
+    def run_asgi(self, app, bodies, concurrency):
+        """Send every body with at most concurrency requests in flight; returns (elapsed, latencies, errors)"""
+        async def drive():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def send(body):
+                async with semaphore:
+                    started = time.perf_counter()
+                    status, _, content = await self.asgi_request(app, 'POST', body)
+                    return time.perf_counter() - started, self._failed(status, content)
+
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(send(body) for body in bodies))
+            return time.perf_counter() - started, outcomes
+
+        elapsed, outcomes = asyncio.run(drive())
+        return elapsed, [latency for latency, _ in outcomes], sum(failed for _, failed in outcomes)
+
+    # Shared
+
+    def _store_csrf(self, headers):
+        for name, value in headers:
+            if name.lower() == 'set-cookie':
+                cookie = SimpleCookie(value)
+                if 'csrftoken' in cookie:
+                    self.token = cookie['csrftoken'].value
+                    self.cookie = f'csrftoken={self.token}'
+
+    @staticmethod
+    def _failed(status, content):
+        if status != 200:
+            return True
+        try:
+            return not json.loads(content).get('success')
+        except ValueError:
+            return True
+
+    def run(self, server, app, bodies, concurrency):
+        """
+        Run one load level and summarize it
+
+        Returns:
+            Dictionary with requests, errors, error_rate, throughput (req/s),
+            p50/p90/p99/mean latency (seconds) and db_queries per request
+        """
+        queries_before = REQUEST_DB_QUERIES.sum(self.view), REQUEST_DB_QUERIES.count(self.view)
+        runner = self.run_wsgi if server == 'wsgi' else self.run_asgi
+        elapsed, latencies, errors = runner(app, bodies, concurrency)
+        queries = REQUEST_DB_QUERIES.sum(self.view) - queries_before[0]
+        counted = REQUEST_DB_QUERIES.count(self.view) - queries_before[1]
+
+        latencies.sort()
+        stats = {
+            'server': server,
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': errors / len(latencies) if latencies else 0.0,
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            # None when RequestMetricsMiddleware is not installed
+            'db_queries': queries / counted if counted else None,
+        }
+        for q in (50, 90, 99):
+            stats[f'p{q}'] = percentile(latencies, q)
+        return stats
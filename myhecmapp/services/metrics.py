@@ -0,0 +1,174 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+# Latency buckets in seconds, from 10 microseconds (memoized stages) to 2.5 seconds (cold requests)
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Buckets for the number of database queries run by one request
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+_metrics = []
+
+
+def _format_labels(names, values, extra=()):
+    """Prometheus label set, e.g. {stage="x",le="0.1"}"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels; its name (samples included) ends in _total"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        if not name.endswith('_total'):
+            raise ValueError(f"Counter name {name!r} must end in _total")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # A counter without labels is exported (as 0) before its first increment
+        self._values = {} if self.labelnames else {(): 0}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        """Add amount to the series identified by the label values"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        """Yield (suffix, label text, value) tuples"""
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield '', _format_labels(self.labelnames, labels), value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            if not self.labelnames:
+                self._values[()] = 0
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, plus sum and count per label set"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        """Record one observation for the series identified by the label values"""
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the wall time spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def sum(self, *labels):
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def samples(self):
+        """Yield (suffix, label text, value) tuples"""
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                yield '_bucket', _format_labels(self.labelnames, labels, [('le', le)]), cumulative
+            yield '_sum', _format_labels(self.labelnames, labels), total
+            yield '_count', _format_labels(self.labelnames, labels), cumulative
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def render():
+    """
+    Render every metric in the Prometheus text exposition format (version 0.0.4)
+
+    The values are those of this process only: behind a multi-process server
+    each scrape reaches one worker, so scrape every worker (e.g. one port
+    each) and aggregate in Prometheus.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type_name}')
+        for suffix, labels, value in metric.samples():
+            lines.append(f'{metric.name}{suffix}{labels} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    """Clear all recorded values, e.g. before a benchmark run"""
+    for metric in _metrics:
+        metric.clear()
+
+
+STAGE_SECONDS = Histogram(
+    'hecm_stage_seconds', 'Time spent computing a calculator stage (memoized hits are not observed)',
+    ['stage'])
+PLF_RESOLUTIONS = Counter(
+    'hecm_plf_resolutions_total', 'Principal Limit Factors resolved, by source', ['source'])
+PLF_RESOLUTION_SECONDS = Histogram(
+    'hecm_plf_resolution_seconds', 'Time spent resolving one Principal Limit Factor, by source', ['source'])
+CONFIG_LOOKUP_SECONDS = Histogram(
+    'hecm_config_lookup_seconds', 'Time spent resolving the HECMConfig of a calculator')
+SERIALIZATION_SECONDS = Histogram(
+    'hecm_serialization_seconds', 'Time spent serializing a response body', ['view'])
+REQUEST_SECONDS = Histogram(
+    'hecm_request_seconds', 'Time spent handling a request, by view', ['view'])
+REQUEST_DB_QUERIES = Histogram(
+    'hecm_request_db_queries', 'Database queries run while handling a request, by view', ['view'],
+    buckets=QUERY_BUCKETS)
+QUOTE_CACHE_HITS = Counter(
+    'hecm_quote_cache_hits_total', 'Quotes served from the quote cache')
+QUOTE_CACHE_MISSES = Counter(
+    'hecm_quote_cache_misses_total', 'Quotes computed and stored in the quote cache')
+QUOTE_CACHE_EVICTIONS = Counter(
+    'hecm_quote_cache_evictions_total', 'Quotes evicted from the in-process quote cache')
@@ -0,0 +1,399 @@
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import F
+from decimal import Decimal
+from ..models.config import HECMConfig
+from ..models.tables import PLFTable
+from .plf_snapshot import read_snapshot, snapshot_path, snapshot_version
+import csv
+import logging
+import numpy as np
+import os
+import threading
+
+logger = logging.getLogger('myhecmapp')
+
+# Tolerance used when matching an interest rate against the CSV data
+CSV_RATE_TOLERANCE = 0.001
+
+# Resolution sources reported by PLFIndex.lookup
+SOURCE_DB = 'db'
+SOURCE_CSV_EXACT = 'csv_exact'
+SOURCE_CSV_NEAREST = 'csv_nearest'
+
+
+def default_csv_path():
+    """Default location of the PLF CSV data"""
+    # Default path - adjust according to your project structure
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(base_dir, 'data', 'consolidated_2017_plfs copy.csv')
+
+
+def read_csv_rows(csv_path):
+    """Read (age, rate, factor) rows from a PLF CSV file with the csv module"""
+    with open(csv_path, newline='') as f:
+        return [(int(float(row['Age'])), float(row['Rate']), float(row['PLF'])) for row in csv.DictReader(f)]
+
+
+class PLFRateTable:
+    """Compiled age -> sorted rate array -> factor table"""
+
+    def __init__(self, ages, rates, factors):
+        """
+        Wrap arrays sorted by age, then rate
+
+        The arrays are only read, so they can be views into a memory-mapped
+        snapshot file.
+
+        Args:
+            ages: Integer array of ages
+            rates: Float array of interest rates
+            factors: Float array of Principal Limit Factors
+        """
+        self.ages = ages
+        self.rates = rates
+        self.factors = factors
+        self._spans = {}
+        self._arrays = {}
+
+        if len(ages):
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(ages)) + 1))
+            ends = np.append(starts[1:], len(ages))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self._spans[int(ages[start])] = (start, end)
+
+    @classmethod
+    def from_rows(cls, rows=()):
+        """
+        Build a table from (age, rate, factor) rows
+
+        Rows sharing the same age and rate keep their original order.
+        """
+        rows = list(rows)
+        ages = np.array([int(age) for age, _, _ in rows], dtype=np.int32)
+        rates = np.array([float(rate) for _, rate, _ in rows], dtype=np.float64)
+        factors = np.array([float(factor) for _, _, factor in rows], dtype=np.float64)
+        # lexsort is stable, so the first occurrence of a rate wins ties
+        order = np.lexsort((rates, ages))
+        return cls(ages[order], rates[order], factors[order])
+
+    def __len__(self):
+        return len(self.ages)
+
+    def __contains__(self, age):
+        return age in self._spans
+
+    def arrays(self, age, decimal=True):
+        """Return (rates, factors) arrays for an age, or None when absent
+
+        The factors are returned as a Decimal object array, converted the
+        same way as the original CSV lookup (Decimal(str(float))), or as the
+        raw float64 view when decimal is False.
+        """
+        if not decimal:
+            span = self._spans.get(age)
+            if span is None:
+                return None
+            start, end = span
+            return self.rates[start:end], self.factors[start:end]
+
+        arrays = self._arrays.get(age)
+        if arrays is None:
+            span = self._spans.get(age)
+            if span is None:
+                return None
+            start, end = span
+            factors = np.empty(end - start, dtype=object)
+            factors[:] = [Decimal(str(factor)) for factor in self.factors[start:end].tolist()]
+            arrays = self._arrays[age] = (self.rates[start:end], factors)
+        return arrays
+
+    def exact(self, age, rate):
+        """Return the factor stored for exactly this age and rate, or None"""
+        arrays = self.arrays(age)
+        if arrays is None:
+            return None
+        rates, factors = arrays
+        i = int(np.searchsorted(rates, rate))
+        if i < len(rates) and rates[i] == rate:
+            return factors[i]
+        return None
+
+    def nearest(self, age, rate):
+        """
+        Find the entry whose rate is closest to the requested rate
+
+        Returns:
+            (factor, rate_diff) tuple, or None when the age is not in the table
+        """
+        arrays = self.arrays(age)
+        if arrays is None:
+            return None
+        rates, factors = arrays
+        i = int(np.searchsorted(rates, rate))
+        if i == len(rates):
+            i -= 1
+        elif i > 0 and rate - rates[i - 1] <= rates[i] - rate:
+            # Prefer the lower rate on ties, like the original first-match scan
+            i -= 1
+        return factors[i], abs(float(rates[i]) - rate)
+
+
+class PLFIndex:
+    """In-memory PLF lookup index for a single HECMConfig"""
+
+    def __init__(self, config_id, table, fallback, version=None, plf_version=None):
+        """
+        Args:
+            config_id: Primary key of the HECMConfig this index belongs to
+            table: PLFRateTable with the PLFTable rows of the config (exact matches only)
+            fallback: PLFRateTable with the CSV data (exact and nearest-rate matches)
+            version: Optional version hash of the data (computed when not given)
+            plf_version: HECMConfig.plf_version the table rows were read at
+        """
+        self.config_id = config_id
+        self.table = table
+        self.fallback = fallback
+        self.version = version or snapshot_version(table, fallback)
+        self.plf_version = plf_version
+
+    @classmethod
+    def load(cls, config):
+        """
+        Memory-map the compiled snapshot of a config, or build the index when there is none
+
+        A snapshot compiled at another PLF version than the database's
+        (e.g. on a host that missed an import) is ignored.
+        """
+        # Read before loading: a change made while loading moves the version again
+        plf_version = read_plf_version(config.pk)
+        snapshot = read_snapshot(snapshot_path(config.pk))
+        if snapshot is not None and snapshot['config_id'] == config.pk:
+            if snapshot['plf_version'] == plf_version:
+                logger.info(f"Loaded PLF snapshot {snapshot['version']} for config {config.pk}")
+                return cls(config.pk, PLFRateTable(*snapshot['table']), PLFRateTable(*snapshot['fallback']),
+                           snapshot['version'], plf_version)
+            logger.warning(f"Ignoring PLF snapshot of config {config.pk} compiled at PLF version "
+                           f"{snapshot['plf_version']} (database is at {plf_version})")
+        return cls.build(config, plf_version)
+
+    @classmethod
+    def build(cls, config, plf_version=None):
+        """Compile the PLFTable rows of a config and the CSV data into an index"""
+        if plf_version is None:
+            plf_version = read_plf_version(config.pk)
+        rows = PLFTable.objects.filter(config=config).values_list('age', 'interest_rate', 'factor')
+        table = PLFRateTable.from_rows(rows)
+
+        # Imported here to avoid a circular import with the calculator module
+        from .calculator import HECMCalculator
+
+        try:
+            plf_data = HECMCalculator._plf_data
+            if plf_data is not None:
+                # Reuse CSV data already loaded with pandas, e.g. from a custom path
+                rows = zip(plf_data['Age'], plf_data['Rate'], plf_data['PLF'])
+            else:
+                rows = read_csv_rows(default_csv_path())
+            fallback = PLFRateTable.from_rows(rows)
+        except Exception as e:
+            logger.error(f"Error compiling CSV PLF data: {str(e)}")
+            fallback = PLFRateTable.from_rows()
+
+        logger.info(
+            f"Built PLF index for config {config.pk}: {len(table)} table entries, {len(fallback)} CSV entries")
+        return cls(config.pk, table, fallback, plf_version=plf_version)
+
+    def lookup(self, age, interest_rate):
+        """
+        Resolve the Principal Limit Factor for an age and interest rate
+
+        Args:
+            age: Age of the youngest borrower
+            interest_rate: Expected interest rate
+
+        Returns:
+            (factor, source, rate_diff) tuple, or None when neither the table
+            nor the CSV data has an entry for the age
+        """
+        rate = float(interest_rate)
+
+        factor = self.table.exact(age, rate)
+        if factor is not None:
+            return factor, SOURCE_DB, 0.0
+
+        match = self.fallback.nearest(age, rate)
+        if match is None:
+            return None
+        factor, rate_diff = match
+        if rate_diff < CSV_RATE_TOLERANCE:
+            return factor, SOURCE_CSV_EXACT, rate_diff
+        return factor, SOURCE_CSV_NEAREST, rate_diff
+
+    def lookup_many(self, ages, interest_rates, decimal=True):
+        """
+        Vectorized lookup() over arrays of ages and interest rates
+
+        Args:
+            ages: Integer array of borrower ages
+            interest_rates: Array of interest rates (Decimal or float)
+            decimal: Return Decimal factors (True) or float64 factors (False)
+
+        Returns:
+            (factors, sources) arrays; where lookup() would return None the
+            source is None and the factor is None (or NaN for float64 factors)
+        """
+        ages = np.asarray(ages, dtype=np.int64)
+        rates = np.asarray(interest_rates).astype(float)
+        if decimal:
+            factors = np.full(len(ages), None, dtype=object)
+        else:
+            factors = np.full(len(ages), np.nan)
+        sources = np.full(len(ages), None, dtype=object)
+
+        for age in np.unique(ages):
+            age = int(age)
+            rows = np.flatnonzero(ages == age)
+            age_rates = rates[rows]
+            unresolved = np.ones(len(rows), dtype=bool)
+
+            arrays = self.table.arrays(age, decimal)
+            if arrays is not None:
+                table_rates, table_factors = arrays
+                i = np.minimum(np.searchsorted(table_rates, age_rates), len(table_rates) - 1)
+                hit = table_rates[i] == age_rates
+                factors[rows[hit]] = table_factors[i[hit]]
+                sources[rows[hit]] = SOURCE_DB
+                unresolved &= ~hit
+
+            arrays = self.fallback.arrays(age, decimal)
+            if arrays is not None and unresolved.any():
+                csv_rates, csv_factors = arrays
+                rows = rows[unresolved]
+                age_rates = age_rates[unresolved]
+                i = np.searchsorted(csv_rates, age_rates)
+                lower = np.maximum(i - 1, 0)
+                upper = np.minimum(i, len(csv_rates) - 1)
+                # Same tie-breaking as PLFRateTable.nearest(): prefer the lower rate
+                use_lower = (i == len(csv_rates)) | (
+                    (i > 0) & (age_rates - csv_rates[lower] <= csv_rates[upper] - age_rates))
+                nearest = np.where(use_lower, lower, upper)
+                factors[rows] = csv_factors[nearest]
+                exact = np.abs(csv_rates[nearest] - age_rates) < CSV_RATE_TOLERANCE
+                sources[rows] = np.where(exact, SOURCE_CSV_EXACT, SOURCE_CSV_NEAREST)
+
+        return factors, sources
+
+
+_indexes = {}
+_lock = threading.Lock()
+# HECMConfig.versions() result each config's index was last compared with, and the configs being rebuilt
+_checked = {}
+_rebuilding = set()
+
+
+def read_plf_version(config_id):
+    """Current HECMConfig.plf_version of a config (None when the config doesn't exist)"""
+    return HECMConfig.objects.filter(pk=config_id).values_list('plf_version', flat=True).first()
+
+
+def get_plf_index(config):
+    """
+    Return the PLF index for a config, building it on first use
+
+    Whenever HECMConfig.versions() re-read the versions (every
+    HECM_VERSION_CHECK_INTERVAL seconds), the config's plf_version is
+    compared with the one the index was loaded at; when it moved, a
+    background thread rebuilds the index while this one keeps serving.
+    """
+    index = _indexes.get(config.pk)
+    if index is None:
+        with _lock:
+            index = _indexes.get(config.pk)
+            if index is None:
+                index = PLFIndex.load(config)
+                _indexes[config.pk] = index
+    else:
+        _check_version(config, index, HECMConfig.versions())
+    return index
+
+
+async def aget_plf_index(config):
+    """Async get_plf_index(): building a missing index runs in a worker thread"""
+    index = _indexes.get(config.pk)
+    if index is None:
+        index = await sync_to_async(get_plf_index)(config)
+    else:
+        _check_version(config, index, await HECMConfig.aversions())
+    return index
+
+
+def _check_version(config, index, versions):
+    """Start a background rebuild of a config's index if its plf_version moved past the index's"""
+    if _checked.get(config.pk) is versions:
+        return
+    _checked[config.pk] = versions
+    version = versions.get(config.pk)
+    # The index may have been loaded after these versions were read
+    if version is None or index.plf_version is None or version[1] <= index.plf_version:
+        return
+
+    with _lock:
+        if config.pk in _rebuilding:
+            return
+        _rebuilding.add(config.pk)
+    threading.Thread(target=_rebuild, args=(config, index), name=f'hecm-plf-rebuild-{config.pk}',
+                     daemon=True).start()
+
+
+def _rebuild(config, stale):
+    """
+    Build a fresh index of a config and swap it in for the stale one
+
+    The new index is complete before it replaces the old one in a single
+    dictionary assignment, so a lookup uses either the old or the new data.
+    """
+    # Imported here to avoid a circular import with the calculator module
+    from .calculator import HECMCalculator
+
+    try:
+        HECMCalculator.refresh_plf_data()
+        index = PLFIndex.load(config)
+        with _lock:
+            # An index loaded or invalidated meanwhile is newer than this rebuild
+            if _indexes.get(config.pk) is stale:
+                _indexes[config.pk] = index
+        logger.info(f"Swapped in PLF index {index.version} for config {config.pk} (was {stale.version})")
+    except Exception as e:
+        logger.error(f"Error rebuilding PLF index for config {config.pk}: {str(e)}")
+    finally:
+        with _lock:
+            _rebuilding.discard(config.pk)
+        connection.close()
+
+
+def invalidate_plf_index(config_id=None):
+    """
+    Drop compiled PLF indexes so they are rebuilt on next use
+
+    Args:
+        config_id: Only drop the index of this config (drops all when None)
+    """
+    with _lock:
+        if config_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(config_id, None)
+
+
+def plf_data_changed(config_id):
+    """
+    Make every process rebuild a config's PLF index after its PLFTable rows changed
+
+    Bumps HECMConfig.plf_version, in the transaction making the change when
+    there is one, so other processes notice it once it commits. Bulk writes
+    (bulk_create, queryset update and delete) send no per-row signals, so
+    code making them calls this once per config and transaction.
+    """
+    HECMConfig.objects.filter(pk=config_id).update(plf_version=F('plf_version') + 1)
+    invalidate_plf_index(config_id)
@@ -0,0 +1,138 @@
+from django.conf import settings
+import hashlib
+import logging
+import mmap
+import numpy as np
+import os
+import struct
+
+logger = logging.getLogger('myhecmapp')
+
+# File layout (little-endian):
+#   header: magic, format version, PLF version of the config (HECMConfig.plf_version), config id,
+#           table rows, CSV rows, SHA-256 of the payload
+#   payload: for the PLFTable rows, then for the CSV rows:
+#            rates float64[n], factors float64[n], ages int32[n] padded to 8 bytes
+MAGIC = b'HECMPLF\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIqQQ32s')
+
+
+def snapshot_dir():
+    """Directory holding the compiled PLF snapshots"""
+    return getattr(settings, 'HECM_PLF_SNAPSHOT_DIR',
+                   os.path.join(settings.BASE_DIR, 'data', 'plf_snapshots'))
+
+
+def snapshot_path(config_id):
+    """Path of the PLF snapshot of a config"""
+    return os.path.join(snapshot_dir(), f'plf_config_{config_id}.bin')
+
+
+def _section(table):
+    """Serialize one PLFRateTable as fixed-width arrays"""
+    ages = np.ascontiguousarray(table.ages, dtype='<i4').tobytes()
+    ages += b'\0' * (-len(ages) % 8)
+    return (np.ascontiguousarray(table.rates, dtype='<f8').tobytes() +
+            np.ascontiguousarray(table.factors, dtype='<f8').tobytes() +
+            ages)
+
+
+def snapshot_version(table, fallback):
+    """Version hash of the PLF data in two PLFRateTables (same as their snapshot's)"""
+    payload = _section(table) + _section(fallback)
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def write_snapshot(index, path=None):
+    """
+    Compile a PLFIndex into a binary snapshot file
+
+    The file is written next to its final location and renamed into place,
+    so readers never see a partially written snapshot.
+
+    Args:
+        index: PLFIndex to compile
+        path: Target path (defaults to snapshot_path() of the index's config)
+
+    Returns:
+        Version hash of the written snapshot
+    """
+    path = path or snapshot_path(index.config_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    payload = _section(index.table) + _section(index.fallback)
+    digest = hashlib.sha256(payload).digest()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, index.plf_version or 0, index.config_id,
+                         len(index.table), len(index.fallback), digest)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Wrote PLF snapshot for config {index.config_id} to {path}")
+    return digest.hex()[:16]
+
+
+def _section_size(count):
+    """Size in bytes of a serialized section with count rows"""
+    return 16 * count + 4 * count + (-4 * count % 8)
+
+
+def _read_section(buffer, offset, count):
+    """Return (ages, rates, factors) array views and the offset after the section"""
+    rates = np.frombuffer(buffer, dtype='<f8', count=count, offset=offset)
+    factors = np.frombuffer(buffer, dtype='<f8', count=count, offset=offset + 8 * count)
+    ages = np.frombuffer(buffer, dtype='<i4', count=count, offset=offset + 16 * count)
+    return (ages, rates, factors), offset + _section_size(count)
+
+
+def read_snapshot(path):
+    """
+    Memory-map a PLF snapshot read-only
+
+    The returned arrays are views into the shared page cache, so every worker
+    process mapping the same file shares one copy of the data.
+
+    Returns:
+        Dictionary with config_id, plf_version, version, table and fallback
+        ((ages, rates, factors) tuples), or None if the file is missing or invalid
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, plf_version, config_id, table_count, fallback_count, digest = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        logger.warning(f"Ignoring PLF snapshot with unknown format: {path}")
+        return None
+
+    if len(buffer) != HEADER.size + _section_size(table_count) + _section_size(fallback_count):
+        logger.warning(f"Ignoring truncated PLF snapshot: {path}")
+        return None
+
+    table, offset = _read_section(buffer, HEADER.size, table_count)
+    fallback, _ = _read_section(buffer, offset, fallback_count)
+
+    return {
+        'config_id': config_id,
+        'plf_version': plf_version,
+        'version': digest.hex()[:16],
+        'table': table,
+        'fallback': fallback
+    }
+
+
+def discard_snapshot(config_id):
+    """Remove the snapshot of a config, e.g. when the config is deleted"""
+    try:
+        os.remove(snapshot_path(config_id))
+        logger.info(f"Removed stale PLF snapshot for config {config_id}")
+    except FileNotFoundError:
+        pass
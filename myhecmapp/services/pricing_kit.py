@@ -0,0 +1,87 @@
+from .calculator import OTHER_CLOSING_COSTS, SOLVER_MAX_AGE
+from .plf_index import get_plf_index
+import base64
+import hashlib
+import numpy as np
+
+# Fixed-point scales of the packed PLF rows (PLFTable stores 3 and 5 decimal places)
+RATE_SCALE = 1000
+FACTOR_SCALE = 100000
+
+# Config fields a client needs to price a quote
+KIT_FIELDS = ('fha_lending_limit', 'mip_rate', 'origination_fee_min', 'origination_fee_cap',
+              'first_tier_limit', 'first_tier_rate', 'second_tier_rate', 'min_age')
+
+
+def kit_version(config):
+    """Version of a config's pricing kit; changes with the config fingerprint or the PLF data"""
+    text = f'{config.fingerprint()}|{get_plf_index(config).version}'
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def _pack(values):
+    """Base64 of a little-endian int32 array"""
+    return base64.b64encode(np.ascontiguousarray(values, dtype='<i4').tobytes()).decode('ascii')
+
+
+def _pack_table(table, ages):
+    """
+    Pack the rows of a PLFRateTable for consecutive ages
+
+    Rows of ages[i] are rates[offsets[i]:offsets[i + 1]] (ascending) and
+    the matching factors, both scaled to integers.
+    """
+    offsets = [0]
+    rates = []
+    factors = []
+    for age in ages:
+        arrays = table.arrays(age, decimal=False)
+        if arrays is not None:
+            rates.append(np.rint(arrays[0] * RATE_SCALE))
+            factors.append(np.rint(arrays[1] * FACTOR_SCALE))
+            offsets.append(offsets[-1] + len(arrays[0]))
+        else:
+            offsets.append(offsets[-1])
+    return {
+        'offsets': _pack(offsets),
+        'rates': _pack(np.concatenate(rates) if rates else []),
+        'factors': _pack(np.concatenate(factors) if factors else []),
+    }
+
+
+def build_pricing_kit(config, min_age=None, max_age=None):
+    """
+    Everything a client needs to price quotes of one config locally
+
+    The PLF rows are the index's exact-match table rows and the nearest-match
+    CSV rows, packed per age as base64 int32 arrays (see _pack_table).
+    Quotes of ages without rows fall back to the server's approximation and
+    can't be priced from the kit.
+
+    Args:
+        config: HECMConfig to build the kit of
+        min_age: First age of the PLF rows (default config.min_age)
+        max_age: Last age of the PLF rows (default SOLVER_MAX_AGE)
+
+    Returns:
+        JSON-serializable dictionary; decimals are strings
+    """
+    min_age = config.min_age if min_age is None else min_age
+    max_age = SOLVER_MAX_AGE if max_age is None else max_age
+    index = get_plf_index(config)
+    ages = range(min_age, max_age + 1)
+    return {
+        'version': kit_version(config),
+        'config': dict({'id': config.pk, 'effective_date': str(config.effective_date)},
+                       **{field: str(getattr(config, field)) for field in KIT_FIELDS}),
+        'other_closing_costs': str(OTHER_CLOSING_COSTS),
+        'plf': {
+            'encoding': 'int32le-base64',
+            'rate_scale': RATE_SCALE,
+            'factor_scale': FACTOR_SCALE,
+            'min_age': min_age,
+            'max_age': max_age,
+            'table': _pack_table(index.table, ages),
+            'fallback': _pack_table(index.fallback, ages),
+        },
+    }
@@ -0,0 +1,176 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from ..models.inputs import HECMInput
+from ..models.results import HECMResult
+from .audit import RESULT_FIELDS, field_value
+from .calculator import HECMCalculator, home_value_breakpoints, home_value_terms
+from .plf_index import get_plf_index
+from decimal import Decimal
+import copy
+import logging
+
+logger = logging.getLogger('myhecmapp')
+
+# Config fields whose effect on a quote depends only on the home value
+PRICING_FIELDS = ('fha_lending_limit', 'mip_rate', 'origination_fee_min', 'origination_fee_cap',
+                  'first_tier_limit', 'first_tier_rate', 'second_tier_rate')
+
+# Pseudo-field reported when the PLF data of the two configs differ (touches every row)
+PLF_DATA = 'plf_data'
+
+
+def changed_ranges(old, new):
+    """
+    Home value ranges whose quotes differ between two configs (PLF aside)
+
+    Between two consecutive breakpoints of either config every term is
+    linear in the home value, so comparing two interior points decides the
+    whole interval, and the breakpoints themselves are compared directly.
+    Endpoints of changed intervals are included, which can only add rows.
+
+    Args:
+        old: HECMConfig the stored results were priced with
+        new: HECMConfig to re-price them with
+
+    Returns:
+        Merged list of inclusive (low, high) ranges; high is None for no upper bound
+    """
+    points = home_value_breakpoints(old) + home_value_breakpoints(new)
+    points = sorted({Decimal('0')} | {point for point in points if point > 0})
+    ranges = []
+    for i, low in enumerate(points):
+        if home_value_terms(old, low) != home_value_terms(new, low):
+            ranges.append((low, low))
+        high = points[i + 1] if i + 1 < len(points) else None
+        step = (high - low) / 3 if high is not None else Decimal('1')
+        if any(home_value_terms(old, low + step * k) != home_value_terms(new, low + step * k) for k in (1, 2)):
+            ranges.append((low, high))
+
+    merged = []
+    for low, high in ranges:
+        if merged and merged[-1][1] is not None and low <= merged[-1][1]:
+            last_high = merged[-1][1]
+            merged[-1] = (merged[-1][0], None if high is None else max(high, last_high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def ranges_filter(ranges, prefix='input_data__'):
+    """Q object selecting home values within the given ranges"""
+    # Bounds beyond what the column can hold can't be bound as query parameters
+    field = HECMInput._meta.get_field('home_value')
+    largest = Decimal(10) ** (field.max_digits - field.decimal_places)
+    query = Q(pk__in=[])
+    for low, high in ranges:
+        if low >= largest:
+            continue
+        bounds = {f'{prefix}home_value__gte': low}
+        if high is not None and high < largest:
+            bounds[f'{prefix}home_value__lte'] = high
+        query |= Q(**bounds)
+    return query
+
+
+def diff_configs(old, new):
+    """
+    Changed pricing inputs between two configs and the rows each one touches
+
+    Each field is judged on its own (old config with only that field
+    changed); the selection used for re-pricing compares the full configs.
+
+    Returns:
+        Dictionary of field -> (old value, new value, Q object of the
+        affected results); PLF_DATA stands for a change of the PLF index
+    """
+    changes = {}
+    for field in PRICING_FIELDS:
+        old_value, new_value = getattr(old, field), getattr(new, field)
+        if old_value == new_value:
+            continue
+        hybrid = copy.copy(old)
+        setattr(hybrid, field, new_value)
+        changes[field] = (old_value, new_value, ranges_filter(changed_ranges(old, hybrid)))
+
+    old_version, new_version = get_plf_index(old).version, get_plf_index(new).version
+    if old_version != new_version:
+        changes[PLF_DATA] = (old_version, new_version, Q())
+    return changes
+
+
+def affected_results(old, new):
+    """Queryset of the results of old whose quote changes under new"""
+    queryset = HECMResult.objects.filter(config_used=old)
+    if get_plf_index(old).version != get_plf_index(new).version:
+        return queryset
+    return queryset.filter(ranges_filter(changed_ranges(old, new)))
+
+
+def _update_rows(results, fields):
+    """
+    Save some fields of many results with one parameterized UPDATE per row
+
+    bulk_update() builds a CASE expression per field over the whole batch,
+    which costs far more to compile than executemany() costs to run.
+    """
+    meta = HECMResult._meta
+    columns = [meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    sql = (f"UPDATE {quote(meta.db_table)} SET " +
+           ', '.join(f"{quote(field.column)} = %s" for field in columns) +
+           f" WHERE {quote(meta.pk.column)} = %s")
+    rows = [[field.get_db_prep_save(getattr(result, field.attname), connection) for field in columns] + [result.pk]
+            for result in results]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def reprice_results(old, new, chunk_size=2000, progress=None):
+    """
+    Re-price the stored results of one config with another, touching only the affected rows
+
+    Affected results are recomputed with the Decimal arithmetic of
+    HECMCalculator.calculate_many() in primary key order and saved one transaction per chunk. Unaffected
+    results keep their values and are moved to the new config with a
+    single UPDATE.
+
+    Args:
+        old: HECMConfig the stored results were priced with
+        new: HECMConfig that takes effect
+        chunk_size: Results recomputed per query and transaction
+        progress: Optional callable receiving the number of results repriced so far
+
+    Returns:
+        (repriced, moved) counts
+    """
+    queryset = affected_results(old, new).select_related('input_data').order_by('pk')
+    fields = list(RESULT_FIELDS) + ['config_used']
+    repriced = 0
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        inputs = [result.input_data for result in chunk]
+        priced = HECMCalculator.calculate_many(
+            [input_data.age for input_data in inputs],
+            [input_data.home_value for input_data in inputs],
+            interest_rate=[input_data.interest_rate for input_data in inputs],
+            margin=[input_data.margin for input_data in inputs],
+            existing_mortgage=[input_data.existing_mortgage for input_data in inputs],
+            config=new, as_decimal=True)
+        for i, result in enumerate(chunk):
+            for field, key in RESULT_FIELDS.items():
+                # Rounded to the column like a recorded quote
+                setattr(result, field, field_value(HECMResult._meta.get_field(field), priced[key][i]))
+            result.config_used = new
+        with transaction.atomic():
+            _update_rows(chunk, fields)
+        repriced += len(chunk)
+        last_pk = chunk[-1].pk
+        if progress:
+            progress(repriced)
+
+    moved = HECMResult.objects.filter(config_used=old).update(config_used=new)
+    logger.info(f"Repriced {repriced} results from config {old.pk} to {new.pk}, moved {moved} unaffected")
+    return repriced, moved
@@ -0,0 +1,195 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from .metrics import QUOTE_CACHE_EVICTIONS, QUOTE_CACHE_HITS, QUOTE_CACHE_MISSES
+from .plf_index import get_plf_index
+import hashlib
+import threading
+
+
+class LRUBackend:
+    """Bounded in-process least-recently-used store"""
+
+    # Never blocks on I/O, so it can be used on an event loop
+    in_process = True
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store a value and return the number of evicted entries"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """Store backed by one of the Django CACHES; eviction is left to the cache itself"""
+
+    # Most Django caches (database, memcached, redis, files) do blocking I/O
+    in_process = False
+
+    def __init__(self, alias='default', timeout=None):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        if self.timeout is None:
+            self.cache.set(key, value)
+        else:
+            self.cache.set(key, value, self.timeout)
+        return 0
+
+    def clear(self):
+        # Keys embed the config and PLF versions, so stale entries are simply never read again
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class QuoteCache:
+    """
+    Cache of get_result_dict() results keyed on normalized inputs
+
+    The key includes the config fingerprint and the PLF data version, so
+    changing either one makes the old entries unreachable. Hits, misses and
+    evictions are also counted in the hecm_quote_cache_*_total metrics.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def key(self, calculator):
+        """Cache key of a calculator's quote"""
+        input_data = calculator.input_data
+        config = calculator.config
+        parts = [
+            str(input_data.age),
+            _normalize(input_data.home_value),
+            _normalize(input_data.interest_rate),
+            _normalize(getattr(input_data, 'margin', None)),
+            _normalize(input_data.existing_mortgage),
+            _normalize(calculator.index_rate),
+            config.fingerprint(),
+            get_plf_index(config).version
+        ]
+        return 'hecm:quote:' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def get_or_compute(self, calculator, compute):
+        """
+        Return the cached result for a calculator, computing and storing it on a miss
+
+        Args:
+            calculator: HECMCalculator whose quote is requested
+            compute: Callable returning the result dictionary
+
+        Returns:
+            A copy of the result dictionary
+        """
+        key = self.key(calculator)
+        result = self.backend.get(key)
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+            QUOTE_CACHE_HITS.inc()
+            return dict(result)
+
+        result = compute()
+        evicted = self.backend.set(key, result)
+        with self._lock:
+            self.misses += 1
+            self.evictions += evicted
+        QUOTE_CACHE_MISSES.inc()
+        if evicted:
+            QUOTE_CACHE_EVICTIONS.inc(amount=evicted)
+        return dict(result)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Return the hit/miss/eviction counters and the current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.backend)
+            }
+
+
+def _normalize(value):
+    """Canonical string form of a numeric input (5.50 and 5.5 share a key)"""
+    if value is None:
+        return ''
+    return str(value.normalize()) if hasattr(value, 'normalize') else str(value)
+
+
+_quote_cache = None
+_quote_cache_lock = threading.Lock()
+
+
+def get_quote_cache():
+    """
+    Return the QuoteCache configured by settings.HECM_RESULT_CACHE, or None when disabled
+
+    Examples:
+        {'BACKEND': 'lru', 'MAX_SIZE': 10000}
+        {'BACKEND': 'django', 'ALIAS': 'default', 'TIMEOUT': 3600}
+    """
+    global _quote_cache
+    options = getattr(settings, 'HECM_RESULT_CACHE', None)
+    if not options:
+        return None
+
+    if _quote_cache is None:
+        with _quote_cache_lock:
+            if _quote_cache is None:
+                if options.get('BACKEND', 'lru') == 'django':
+                    backend = DjangoCacheBackend(options.get('ALIAS', 'default'), options.get('TIMEOUT'))
+                else:
+                    backend = LRUBackend(options.get('MAX_SIZE', 10000))
+                _quote_cache = QuoteCache(backend)
+    return _quote_cache
+
+
+def quote_cache_in_process():
+    """Whether get_result_dict() may run on an event loop: the quote cache is disabled or in-process"""
+    cache = get_quote_cache()
+    return cache is None or cache.backend.in_process
+
+
+def reset_quote_cache():
+    """Drop the configured cache so it is rebuilt from the current settings"""
+    global _quote_cache
+    with _quote_cache_lock:
+        _quote_cache = None
@@ -0,0 +1,356 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import math
+import numpy as np
+
+# Book columns used by the stress test
+BOOK_COLUMNS = ('age', 'margin', 'max_claim_amount', 'principal_limit', 'total_closing_costs',
+                'existing_mortgage', 'max_cash_out')
+
+# Histogram bins of the aggregated distributions; every aggregate is an integer
+# count, so merging chunks in any order (from any number of workers) gives
+# exactly the same totals
+GROWTH_EDGES = np.geomspace(1.0, 64.0, 4001)
+RATE_EDGES = np.linspace(0.0, 25.0, 2501)
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+class RateModel:
+    """
+    Mean-reverting (Ornstein-Uhlenbeck / Vasicek) index rate model, in percent
+
+    Paths are sampled monthly with the exact discretization and floored at 0.
+    """
+
+    def __init__(self, start=3.50, mean=3.50, reversion=0.15, volatility=1.0):
+        """
+        Args:
+            start: Index rate at closing (the calculator's default index is 3.50)
+            mean: Long-run mean the index reverts to
+            reversion: Annual mean-reversion speed
+            volatility: Annual volatility in percentage points
+        """
+        self.start = float(start)
+        self.mean = float(mean)
+        self.reversion = float(reversion)
+        self.volatility = float(volatility)
+
+    def simulate(self, rng, count, months):
+        """Return a (count x months) array of monthly index rates"""
+        dt = 1 / 12
+        decay = math.exp(-self.reversion * dt)
+        if self.reversion > 0:
+            scale = self.volatility * math.sqrt((1 - decay ** 2) / (2 * self.reversion))
+        else:
+            scale = self.volatility * math.sqrt(dt)
+        shocks = rng.standard_normal((count, months)) * scale
+
+        rates = np.empty((count, months))
+        rate = np.full(count, self.start)
+        for month in range(months):
+            rate = self.mean + (rate - self.mean) * decay + shocks[:, month]
+            rates[:, month] = rate
+        return np.maximum(rates, 0.0)
+
+    def as_dict(self):
+        return {'start': self.start, 'mean': self.mean, 'reversion': self.reversion,
+                'volatility': self.volatility}
+
+
+def load_book(queryset=None, limit=None):
+    """
+    Load stored quotes (HECMResult rows with their HECMInput) as float64 columns
+
+    Args:
+        queryset: Optional HECMResult queryset (defaults to every stored quote)
+        limit: Optional maximum number of quotes
+
+    Returns:
+        Dictionary of BOOK_COLUMNS arrays
+    """
+    # Imported here so pool workers can import this module without Django set up
+    from ..models.results import HECMResult
+
+    if queryset is None:
+        queryset = HECMResult.objects.all()
+    rows = queryset.order_by('pk').values_list(
+        'input_data__age', 'input_data__margin', 'max_claim_amount', 'principal_limit',
+        'total_closing_costs', 'input_data__existing_mortgage', 'max_cash_out')
+    if limit:
+        rows = rows[:limit]
+    data = np.array([[float(value) for value in row] for row in rows], dtype=np.float64).reshape(-1, 7)
+    return {name: data[:, i].copy() for i, name in enumerate(BOOK_COLUMNS)}
+
+
+def synthetic_book(count, seed=42, config=None):
+    """Price a seeded synthetic book with HECMCalculator.calculate_many (for trying the stress test)"""
+    from .calculator import HECMCalculator
+
+    rng = np.random.default_rng(seed)
+    age = rng.integers(62, 90, count)
+    margin = np.round(rng.choice([1.25, 1.5, 1.75, 2.0, 2.25, 2.5], count), 2)
+    existing_mortgage = np.round(rng.uniform(0, 150000, count), -3)
+    results = HECMCalculator.calculate_many(
+        age, np.round(rng.uniform(150000, 1200000, count), -3), margin=margin,
+        existing_mortgage=existing_mortgage, config=config, numeric='cents')
+    return {
+        'age': age.astype(np.float64),
+        'margin': margin,
+        'max_claim_amount': results['max_claim_amount'],
+        'principal_limit': results['principal_limit'],
+        'total_closing_costs': results['total_closing_costs'],
+        'existing_mortgage': existing_mortgage,
+        'max_cash_out': results['max_cash_out']
+    }
+
+
+def _histogram(values, edges):
+    """Integer counts of values in the bins of edges (out-of-range values go to the end bins)"""
+    bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+    return np.bincount(bins.ravel(), minlength=len(edges) - 1).astype(np.int64)
+
+
+def histogram_percentile(counts, edges, q):
+    """Percentile q of a histogram, interpolated linearly inside the bin"""
+    total = counts.sum()
+    if not total:
+        return None
+    target = total * q / 100
+    cumulative = np.cumsum(counts)
+    i = int(np.searchsorted(cumulative, target, side='left'))
+    i = min(i, len(counts) - 1)
+    before = cumulative[i - 1] if i else 0
+    inside = (target - before) / counts[i] if counts[i] else 0.0
+    return float(edges[i] + (edges[i + 1] - edges[i]) * inside)
+
+
+def discrete_percentile(counts, q):
+    """Percentile q of a histogram of integers (counts[v] occurrences of v): the first value reaching it"""
+    total = counts.sum()
+    if not total:
+        return None
+    # At least one occurrence, so that low percentiles skip the empty values before the first one
+    target = max(total * q / 100, 1)
+    return int(np.searchsorted(np.cumsum(counts), target, side='left'))
+
+
+class _Context:
+    """Inputs shared by every chunk of a stress test"""
+
+    def __init__(self, book, params):
+        self.book = book
+        self.params = params
+        months = params['months']
+        draw = params['draw']
+
+        # Loans are grouped by margin: every loan with the same margin grows the same way on a path
+        self.margins, self.groups = np.unique(book['margin'], return_inverse=True)
+        self.horizons = [h for h in params['horizons'] if 0 < h <= months]
+
+        # A loan crosses over when balance >= max claim amount grown by house prices,
+        # i.e. when its log growth net of appreciation reaches log(max claim / opening balance)
+        opening = book['total_closing_costs'] + book['existing_mortgage'] + draw * book['max_cash_out']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            threshold = np.log(book['max_claim_amount'] / opening)
+        self.thresholds = np.where(opening > 0, threshold, np.inf)
+
+
+_worker_context = None
+
+
+def _init_worker(shm_name, layout, params):
+    """Process pool initializer: attach the shared, read-only book"""
+    global _worker_context
+    shm = shared_memory.SharedMemory(name=shm_name)
+    book = {}
+    for name, offset, length in layout:
+        array = np.ndarray((length,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        book[name] = array
+    _worker_context = _Context(book, params)
+    # Keep the mapping alive for the lifetime of the worker
+    _worker_context.shm = shm
+
+
+def _run_chunk(chunk, count):
+    return evaluate_chunk(_worker_context, chunk, count)
+
+
+def evaluate_chunk(context, chunk, count):
+    """
+    Simulate count rate paths of one chunk and aggregate them over the book
+
+    The chunk's random stream is derived from the seed and the chunk number
+    only, so a chunk produces the same paths whichever worker runs it.
+
+    Returns:
+        Dictionary of integer aggregates (see _empty_aggregates)
+    """
+    params = context.params
+    months = params['months']
+    model = RateModel(**params['model'])
+    rng = np.random.default_rng(np.random.SeedSequence(params['seed'], spawn_key=(chunk,)))
+    rates = model.simulate(rng, count, months)
+
+    book = context.book
+    aggregates = _empty_aggregates(len(book['margin']), len(context.margins), context.horizons, months)
+    for h, horizon in enumerate(context.horizons):
+        aggregates['rate'][h] += _histogram(rates[:, horizon - 1], RATE_EDGES)
+
+    appreciation = math.log1p(params['appreciation']) / 12 * np.arange(1, months + 1)
+    for g, margin in enumerate(context.margins):
+        # Adjustable note rate: index + margin, capped at the lifetime cap over the initial rate
+        note = np.minimum(rates + margin, model.start + margin + params['lifetime_cap'])
+        log_growth = np.cumsum(np.log1p((note / 100 + params['annual_mip_rate']) / 12), axis=1)
+        for h, horizon in enumerate(context.horizons):
+            aggregates['growth'][h, g] += _histogram(np.exp(log_growth[:, horizon - 1]), GROWTH_EDGES)
+
+        loans = np.flatnonzero(context.groups == g)
+        thresholds = context.thresholds[loans]
+        peak = np.maximum.accumulate(log_growth - appreciation, axis=1)
+        # First month (0-based) where the running peak reaches each loan's threshold; months = never
+        first = np.stack([np.searchsorted(peak[path], thresholds, side='left') for path in range(count)])
+        crossed = first < months
+        aggregates['crossings'][loans] += crossed.sum(axis=0)
+        aggregates['crossing_month_sum'][loans] += np.where(crossed, first + 1, 0).sum(axis=0)
+        aggregates['crossing_months'] += np.bincount(first[crossed] + 1, minlength=months + 1).astype(np.int64)
+    return aggregates
+
+
+def _empty_aggregates(loans, groups, horizons, months):
+    return {
+        'crossings': np.zeros(loans, dtype=np.int64),
+        'crossing_month_sum': np.zeros(loans, dtype=np.int64),
+        'crossing_months': np.zeros(months + 1, dtype=np.int64),
+        'growth': np.zeros((len(horizons), groups, len(GROWTH_EDGES) - 1), dtype=np.int64),
+        'rate': np.zeros((len(horizons), len(RATE_EDGES) - 1), dtype=np.int64),
+    }
+
+
+def _chunks(scenarios, chunk_size):
+    return [(chunk, min(chunk_size, scenarios - start))
+            for chunk, start in enumerate(range(0, scenarios, chunk_size))]
+
+
+def run_stress_test(book, scenarios=1000, months=360, model=None, seed=42, chunk_size=250, workers=1,
+                    draw=1.0, appreciation=0.0, annual_mip_rate=0.005, lifetime_cap=10.0,
+                    horizons=(60, 120, 180, 240, 300, 360)):
+    """
+    Stress a book of quotes against simulated index rate paths
+
+    Paths are simulated in chunks of chunk_size; each chunk only returns
+    integer histograms and per-loan counters, which are summed as chunks
+    complete, so no path is kept in memory. The book is placed in shared
+    memory once and mapped read-only by every worker. Results only depend on
+    the seed and chunk_size, not on the number of workers.
+
+    Args:
+        book: Dictionary of BOOK_COLUMNS arrays (see load_book)
+        scenarios: Number of rate paths
+        months: Projection horizon in months
+        model: RateModel (defaults to RateModel())
+        seed: Seed of the simulation
+        chunk_size: Rate paths per chunk
+        workers: Worker processes (1 evaluates in this process)
+        draw: Fraction of the available cash drawn at closing
+        appreciation: Annual house price appreciation (e.g. 0.02)
+        annual_mip_rate: Annual MIP rate charged on the balance
+        lifetime_cap: Maximum increase of the note rate over its initial value, in percentage points
+        horizons: Months at which principal limit growth and the index rate are reported
+
+    Returns:
+        Dictionary with the parameters, per-loan crossover probabilities and
+        mean crossover months, and the aggregated histograms
+    """
+    model = model or RateModel()
+    params = {
+        'seed': seed, 'months': months, 'model': model.as_dict(), 'draw': draw,
+        'appreciation': appreciation, 'annual_mip_rate': annual_mip_rate,
+        'lifetime_cap': lifetime_cap, 'horizons': list(horizons),
+    }
+    book = {name: np.ascontiguousarray(book[name], dtype=np.float64) for name in BOOK_COLUMNS}
+    context = _Context(book, params)
+    totals = _empty_aggregates(len(book['margin']), len(context.margins), context.horizons, months)
+    chunks = _chunks(scenarios, chunk_size)
+
+    def merge(aggregates):
+        for name, values in aggregates.items():
+            totals[name] += values
+
+    if workers <= 1 or len(chunks) == 1:
+        for chunk, count in chunks:
+            merge(evaluate_chunk(context, chunk, count))
+    else:
+        size = sum(array.nbytes for array in book.values())
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            layout = []
+            offset = 0
+            for name, array in book.items():
+                np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf, offset=offset)[:] = array
+                layout.append((name, offset, len(array)))
+                offset += array.nbytes
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shm.name, layout, params)) as executor:
+                for aggregates in executor.map(_run_chunk, *zip(*chunks)):
+                    merge(aggregates)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    crossings = totals['crossings']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_month = np.where(crossings > 0, totals['crossing_month_sum'] / crossings, np.nan)
+    return {
+        'params': params,
+        'loans': len(book['margin']),
+        'scenarios': scenarios,
+        'margins': context.margins,
+        'horizons': context.horizons,
+        'crossover_probability': crossings / scenarios,
+        'mean_crossover_month': mean_month,
+        'crossover_months': totals['crossing_months'],
+        'growth': totals['growth'],
+        'loans_per_margin': np.bincount(context.groups, minlength=len(context.margins)),
+        'rate': totals['rate'],
+    }
+
+
+def summarize(result, percentiles=PERCENTILES):
+    """
+    Reduce a run_stress_test() result to JSON-friendly percentiles
+
+    Principal limit growth is reported per margin and for the whole book
+    (each margin weighted by its number of loans).
+    """
+    horizons = result['horizons']
+    loans_per_margin = result['loans_per_margin']
+    probability = result['crossover_probability']
+    summary = {
+        'loans': result['loans'],
+        'scenarios': result['scenarios'],
+        'params': result['params'],
+        'crossover': {
+            'book_probability': float(probability.mean()) if len(probability) else 0.0,
+            'loans_at_risk': int((probability > 0).sum()),
+            'loan_probability': {f'p{q}': float(np.percentile(probability, q)) if len(probability) else 0.0
+                                 for q in percentiles},
+            'month': {f'p{q}': discrete_percentile(result['crossover_months'], q) for q in percentiles},
+        },
+        'principal_limit_growth': {},
+        'index_rate': {},
+    }
+    for h, horizon in enumerate(horizons):
+        book_counts = (result['growth'][h] * loans_per_margin[:, None]).sum(axis=0)
+        summary['principal_limit_growth'][horizon] = {
+            'book': {f'p{q}': histogram_percentile(book_counts, GROWTH_EDGES, q) for q in percentiles},
+            'by_margin': {
+                f'{margin:g}': {f'p{q}': histogram_percentile(result['growth'][h, g], GROWTH_EDGES, q)
+                                for q in percentiles}
+                for g, margin in enumerate(result['margins'])
+            }
+        }
+        summary['index_rate'][horizon] = {f'p{q}': histogram_percentile(result['rate'][h], RATE_EDGES, q)
+                                          for q in percentiles}
+    return summary
@@ -0,0 +1,39 @@
+from decimal import Decimal
+from ..models.config import HECMConfig
+from .calculator import HECMCalculator
+from .plf_index import get_plf_index
+import logging
+import time
+
+logger = logging.getLogger('myhecmapp')
+
+
+def warm_up():
+    """
+    Preload the current config and its PLF index and run one throwaway quote
+
+    Returns:
+        Dictionary with the time spent on each step, in seconds
+    """
+    started = time.perf_counter()
+    config = HECMConfig.get_current()
+    config_loaded = time.perf_counter()
+
+    get_plf_index(config)
+    index_loaded = time.perf_counter()
+
+    # Touch the remaining code paths of a quote
+    HECMCalculator({
+        'age': config.min_age,
+        'home_value': Decimal('100000'),
+        'interest_rate': Decimal('5.0')
+    }, config).calculate()
+    finished = time.perf_counter()
+
+    timings = {
+        'config': config_loaded - started,
+        'plf_index': index_loaded - config_loaded,
+        'quote': finished - index_loaded
+    }
+    logger.info(f"Warmed up in {finished - started:.3f}s: {timings}")
+    return timings
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models.config import HECMConfig
+from .models.tables import PLFTable
+from .services.plf_index import invalidate_plf_index, plf_data_changed
+from .services.plf_snapshot import discard_snapshot
+
+
+@receiver(post_save, sender=PLFTable)
+def plf_entry_changed(sender, instance, **kwargs):
+    """Rebuild the PLF index of a config when one of its table rows is saved (in every process)"""
+    # No post_delete receiver: it would make every queryset delete() load and signal each row;
+    # bulk deletes call plf_data_changed() once instead (see import_plf_data and PLFTableAdmin)
+    plf_data_changed(instance.config_id)
+
+
+@receiver([post_save, post_delete], sender=HECMConfig)
+def config_changed(sender, instance, **kwargs):
+    """Reload the cached configs (and the PLF index of the config) when one of them changes"""
+    HECMConfig.clear_cache()
+    invalidate_plf_index(instance.pk)
+    if kwargs['signal'] is post_delete:
+        discard_snapshot(instance.pk)
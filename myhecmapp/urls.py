@@ -5,4 +5,12 @@ app_name = 'myhecmapp'
 
 urlpatterns = [
     path('calculate/', views.calculate_hecm, name='calculate'),
+    path('calculate/quote/', views.quote_hecm, name='quote'),
+    path('calculate/kit/', views.pricing_kit, name='pricing_kit'),
+    path('calculate/batch/', views.calculate_hecm_batch, name='calculate_batch'),
+    path('calculate/solve/', views.solve_hecm, name='solve'),
+    path('calculate/sweep/', views.sweep_hecm, name='sweep'),
+    path('async/calculate/', views.calculate_hecm_async, name='calculate_async'),
+    path('async/calculate/batch/', views.calculate_hecm_batch_async, name='calculate_batch_async'),
+    path('metrics/', views.hecm_metrics, name='metrics'),
 ]
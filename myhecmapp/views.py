@@ -1,56 +1,495 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
-from .services.calculator import HECMCalculator
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST, require_safe
+from .services import metrics
+from .services.audit import record_quote
+from .services.calculator import SOLVER_MAX_AGE, HECMCalculator
+from .services.plf_index import aget_plf_index, get_plf_index
+from .services.pricing_kit import build_pricing_kit, kit_version
+from .services.result_cache import quote_cache_in_process
+from .models.config import HECMConfig
 from .models.inputs import HECMInput
 from decimal import Decimal, InvalidOperation
-import traceback
+from itertools import chain
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger('myhecmapp')
+
+# Upper bound on the number of grid points priced by one sweep request
+MAX_SWEEP_POINTS = 10000
+
+# Inputs solve_hecm can solve for, and the HECMCalculator solver of each
+SOLVERS = {
+    'home_value': 'solve_home_value',
+    'existing_mortgage': 'solve_max_payoff',
+    'age': 'solve_min_age',
+}
+
+# Widest age range of PLF rows served in one pricing kit
+MAX_KIT_AGES = 60
+
+# Query parameters of the GET quote API, in canonical order
+QUOTE_PARAMETERS = ('age', 'home_value', 'interest_rate', 'margin', 'index_rate', 'existing_mortgage')
+
+
+def _to_decimal(value):
+    """Convert a raw request value to Decimal, using 0 for invalid values"""
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal('0')
+
+
+def _to_int(value, name='age'):
+    """
+    Convert a raw request value to int, using 0 for invalid values
+
+    Whole numbers written as decimals (70.0 in JSON, "70.0" in a form) are
+    converted; a fraction such as 70.5 raises ValueError.
+    """
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return 0
+    if not number.is_finite():
+        return 0
+    if number != number.to_integral_value():
+        raise ValueError(f"{name} must be a whole number")
+    return int(number)
+
+
+def _parse_scenario(data):
+    """
+    Convert raw form or JSON values into calculator input
+
+    Args:
+        data: Mapping with home_value, age, interest_rate and existing_mortgage
+
+    Returns:
+        Dictionary suitable for HECMCalculator
+
+    Raises:
+        ValueError: The age is not a whole number
+    """
+    return {
+        'home_value': _to_decimal(data.get('home_value', '0')),
+        'age': _to_int(data.get('age', '0')),
+        'interest_rate': _to_decimal(data.get('interest_rate', '0')),
+        'existing_mortgage': _to_decimal(data.get('existing_mortgage', '0'))
+    }
+
+
+def _quote_response(scenario, config=None, view='calculate', index_rate=None, error_status=200):
+    """
+    Calculate one scenario and wrap the results in a JsonResponse
+
+    A failed calculation is logged with its traceback and answered with a
+    generic error message and error_status.
+    """
+    try:
+        # Use calculator to get results
+        calculator = HECMCalculator(scenario, config, index_rate)
+
+        results = calculator.get_result_dict()
+        record_quote(calculator)
+        with metrics.SERIALIZATION_SECONDS.time(view):
+            response = JsonResponse({'success': True, 'results': results})
+        # Lets pages pricing from a pricing kit notice that theirs is outdated
+        response['X-HECM-Kit-Version'] = kit_version(calculator.config)
+        return response
+    except Exception:
+        logger.exception("Quote calculation failed for %s", scenario, extra={'event': 'quote.error'})
+        return JsonResponse({
+            'success': False,
+            'error': "The quote could not be calculated"
+        }, status=error_status)
 
 
 def calculate_hecm(request):
     """View to handle HECM calculations"""
     if request.method == 'POST':
-        # For API requests
+        # For API requests: get form data and convert to appropriate types
         try:
-            # Get form data and convert to appropriate types
-            try:
-                home_value = Decimal(request.POST.get('home_value', '0'))
-            except InvalidOperation:
-                home_value = Decimal('0')
-
-            try:
-                age = int(request.POST.get('age', '0'))
-            except ValueError:
-                age = 0
-
-            try:
-                interest_rate = Decimal(request.POST.get('interest_rate', '0'))
-            except InvalidOperation:
-                interest_rate = Decimal('0')
-
-            try:
-                existing_mortgage = Decimal(request.POST.get('existing_mortgage', '0'))
-            except InvalidOperation:
-                existing_mortgage = Decimal('0')
-
-            # Use calculator to get results
-            calculator = HECMCalculator({
-                'home_value': home_value,
-                'age': age,
-                'interest_rate': interest_rate,
-                'existing_mortgage': existing_mortgage
-            })
-
-            results = calculator.get_result_dict()
-            return JsonResponse({'success': True, 'results': results})
-        except Exception as e:
-            error_traceback = traceback.format_exc()
-            print(f"Error: {str(e)}")
-            print(f"Traceback: {error_traceback}")
-            return JsonResponse({
-                'success': False,
-                'error': str(e),
-                'traceback': error_traceback
-            })
+            scenario = _parse_scenario(request.POST)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return _quote_response(scenario)
     else:
         # For GET requests, show the calculator form
         return render(request, 'myhecmapp/calculator.html')
+
+
+async def calculate_hecm_async(request):
+    """
+    Async variant of calculate_hecm for ASGI deployments
+
+    The config and PLF index come from the in-process caches; only a cache
+    miss queries the database, through the async ORM or a worker thread.
+    The quote is computed on the event loop when the quote cache is
+    disabled or in-process, and in a worker thread when it is a Django
+    cache, whose backend may do blocking I/O.
+    """
+    if request.method == 'POST':
+        try:
+            scenario = _parse_scenario(request.POST)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        config = await HECMConfig.aget_current()
+        await aget_plf_index(config)
+        if quote_cache_in_process():
+            return _quote_response(scenario, config, view='calculate_async')
+        return await sync_to_async(_quote_response)(scenario, config, view='calculate_async')
+    else:
+        return render(request, 'myhecmapp/calculator.html')
+
+
+def _canonical_quote(query):
+    """
+    Validate the query of a GET quote request and put it in canonical form
+
+    Args:
+        query: QueryDict of the request
+
+    Returns:
+        Dictionary of the given QUOTE_PARAMETERS in canonical order, with the
+        age as int and the amounts and rates as normalized Decimals
+    """
+    unknown = set(query) - set(QUOTE_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+
+    values = {}
+    for name in QUOTE_PARAMETERS:
+        raw = query.get(name, '').strip()
+        if not raw:
+            continue
+        try:
+            value = int(raw) if name == 'age' else Decimal(raw)
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if name != 'age':
+            if not value.is_finite():
+                raise ValueError(f"{name} must be a number")
+            value = value.normalize()
+        values[name] = value
+
+    if 'age' not in values or 'home_value' not in values:
+        raise ValueError("age and home_value are required")
+    if 'interest_rate' not in values and 'margin' not in values:
+        raise ValueError("interest_rate or margin is required")
+    if ('interest_rate' in values and 'margin' in values and 'index_rate' in values and
+            values['interest_rate'] != values['margin'] + values['index_rate']):
+        raise ValueError("interest_rate must equal margin + index_rate when all three are given")
+    return values
+
+
+def _quote_etag(values, config):
+    """Strong ETag of a quote: its canonical inputs, the config fingerprint and the PLF data version"""
+    parts = [f'{name}={value}' for name, value in values.items()]
+    parts += [config.fingerprint(), get_plf_index(config).version]
+    return '"' + hashlib.sha1('&'.join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def _etag_matches(request, etag):
+    """Whether the request's If-None-Match covers an ETag (weak comparison)"""
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in if_none_match or etag in (tag.removeprefix('W/') for tag in if_none_match)
+
+
+@require_safe
+def quote_hecm(request):
+    """
+    Cacheable GET variant of calculate_hecm
+
+    Prices the query parameters with the config in effect today. A quote
+    carries a strong ETag of the canonical inputs and the config/PLF
+    versions, and Cache-Control no-cache: caches keep it but revalidate it
+    on every use, since the PLF data can change at any time, and a matching
+    If-None-Match is answered with 304 without calculating. A failed
+    calculation is answered with 500 and is not stored.
+    """
+    try:
+        values = _canonical_quote(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    try:
+        config = HECMConfig.get_effective(timezone.localdate())
+    except HECMConfig.DoesNotExist:
+        config = HECMConfig.get_current()
+    etag = _quote_etag(values, config)
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        scenario = {
+            'age': values['age'],
+            'home_value': values['home_value'],
+            'existing_mortgage': values.get('existing_mortgage', Decimal('0'))
+        }
+        for name in ('interest_rate', 'margin'):
+            if name in values:
+                scenario[name] = values[name]
+        response = _quote_response(scenario, config, view='quote', index_rate=values.get('index_rate'),
+                                   error_status=500)
+        if response.status_code != 200:
+            patch_cache_control(response, no_store=True)
+            return response
+
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@require_safe
+def pricing_kit(request):
+    """
+    Serve the pricing kit of the current config for pages that price locally
+
+    Optional min_age and max_age select the PLF rows. The kit carries an
+    ETag of its version and age range. Without a v parameter, or with one
+    that isn't the current version, the current kit is served with
+    Cache-Control no-cache, so caches revalidate it on every use. At
+    ?v=<current version> its content never changes and it may be cached
+    for HECM_QUOTE_MAX_AGE seconds; quote responses carry the current
+    version in an X-HECM-Kit-Version header.
+    """
+    config = HECMConfig.get_current()
+    try:
+        min_age = int(request.GET.get('min_age') or config.min_age)
+        max_age = int(request.GET.get('max_age') or max(min_age, SOLVER_MAX_AGE))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': "min_age and max_age must be integers"}, status=400)
+    if not 0 <= max_age - min_age < MAX_KIT_AGES:
+        return JsonResponse({
+            'success': False,
+            'error': f"max_age must be at least min_age and at most {MAX_KIT_AGES - 1} years above it"
+        }, status=400)
+
+    version = kit_version(config)
+    etag = f'"{version}-{min_age}-{max_age}"'
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        kit = build_pricing_kit(config, min_age, max_age)
+        with metrics.SERIALIZATION_SECONDS.time('pricing_kit'):
+            response = JsonResponse({'success': True, 'kit': kit})
+
+    response['ETag'] = etag
+    if request.GET.get('v') == version:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'HECM_QUOTE_MAX_AGE', 31536000),
+                            immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@require_POST
+def solve_hecm(request):
+    """
+    View to solve for one input of a quote from the cash wanted at closing
+
+    "solve" names the unknown input (home_value, existing_mortgage or age)
+    and "cash_out" the cash wanted after the payoff and closing costs; the
+    other inputs are read like calculate_hecm reads them. The response has
+    the solved value (null when no value works) and the quote at that value.
+    """
+    unknown = request.POST.get('solve')
+    if unknown not in SOLVERS:
+        return JsonResponse({'success': False, 'error': f"solve must be one of {', '.join(SOLVERS)}"}, status=400)
+    try:
+        cash_out = Decimal(request.POST.get('cash_out') or '0')
+    except InvalidOperation:
+        return JsonResponse({'success': False, 'error': "cash_out must be a decimal"}, status=400)
+
+    try:
+        scenario = _parse_scenario(request.POST)
+        calculator = HECMCalculator(scenario)
+        value = getattr(calculator, SOLVERS[unknown])(cash_out)
+        results = None
+        if value is not None:
+            scenario[unknown] = value
+            results = HECMCalculator(scenario, calculator.config).get_result_dict()
+    except (ArithmeticError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    with metrics.SERIALIZATION_SECONDS.time('solve'):
+        return JsonResponse({
+            'success': True,
+            'solve': unknown,
+            'value': None if value is None else float(value),
+            'results': results
+        })
+
+
+def _decimal_list(value):
+    """Parse a comma-separated list of decimals, e.g. "1.5,1.75,2" """
+    return [Decimal(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def _sweep_margins(data):
+    """
+    Read the margin grid of a sweep request
+
+    Either an explicit "margins" list or an inclusive range given by
+    margin_start, margin_stop and margin_step.
+    """
+    if data.get('margins'):
+        return _decimal_list(data['margins'])
+
+    start = Decimal(data['margin_start'])
+    stop = Decimal(data['margin_stop'])
+    step = Decimal(data['margin_step'])
+    if step <= 0:
+        raise ValueError("margin_step must be positive")
+    if (stop - start) / step >= MAX_SWEEP_POINTS:
+        raise ValueError(f"Sweep is limited to {MAX_SWEEP_POINTS} grid points")
+
+    margins = []
+    margin = start
+    while margin <= stop:
+        margins.append(margin)
+        margin += step
+    return margins
+
+
+@require_POST
+def sweep_hecm(request):
+    """View to price one borrower across a grid of margins and index rates"""
+    try:
+        margins = _sweep_margins(request.POST)
+        index_rates = _decimal_list(request.POST.get('index_rates', '')) or None
+        if not margins:
+            raise ValueError("At least one margin is required")
+        if len(margins) * len(index_rates or [None]) > MAX_SWEEP_POINTS:
+            raise ValueError(f"Sweep is limited to {MAX_SWEEP_POINTS} grid points")
+
+        calculator = HECMCalculator(_parse_scenario(request.POST))
+        results = calculator.sweep_margins(margins, index_rates)
+        with metrics.SERIALIZATION_SECONDS.time('sweep'):
+            return JsonResponse({'success': True, 'results': results})
+    except (KeyError, InvalidOperation):
+        return JsonResponse({
+            'success': False,
+            'error': "Provide margins or margin_start, margin_stop and margin_step as decimals"
+        }, status=400)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+def _iter_scenarios(request):
+    """
+    Yield (index, scenario) pairs from a JSON array or NDJSON request body
+
+    NDJSON bodies are read line by line; a scenario that cannot be decoded is
+    yielded as the exception so the caller can report it for that row.
+    """
+    lines = iter(request)
+    for first_line in lines:
+        if first_line.strip():
+            break
+    else:
+        return
+
+    if first_line.lstrip().startswith(b'['):
+        # JSON array: the whole body is needed to decode it
+        body = first_line + b''.join(lines)
+        try:
+            scenarios = json.loads(body)
+        except ValueError as e:
+            yield 0, e
+            return
+        yield from enumerate(scenarios)
+        return
+
+    index = 0
+    for line in chain([first_line], lines):
+        if not line.strip():
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as e:
+            yield index, e
+        index += 1
+
+
+def _batch_row(index, scenario, config, view='calculate_batch'):
+    """Calculate one scenario of a batch and return its NDJSON line"""
+    try:
+        if isinstance(scenario, Exception):
+            raise scenario
+        if not isinstance(scenario, dict):
+            raise ValueError("Scenario must be a JSON object")
+        calculator = HECMCalculator(_parse_scenario(scenario), config)
+        results = calculator.get_result_dict()
+        record_quote(calculator)
+        row = {'index': index, 'success': True, 'results': results}
+    except Exception as e:
+        row = {'index': index, 'success': False, 'error': str(e)}
+    with metrics.SERIALIZATION_SECONDS.time(view):
+        return json.dumps(row) + '\n'
+
+
+@csrf_exempt
+@require_POST
+def calculate_hecm_batch(request):
+    """
+    View to handle batches of HECM calculations
+
+    Accepts a JSON array or an NDJSON body of scenarios and streams one
+    NDJSON result line per scenario, in input order, as soon as it is computed.
+    It is called by other services rather than pages, so it is exempt
+    from CSRF checks.
+    """
+    # Resolve the config and its PLF index once for the whole batch
+    config = HECMConfig.get_current()
+    get_plf_index(config)
+
+    rows = (_batch_row(index, scenario, config) for index, scenario in _iter_scenarios(request))
+    return StreamingHttpResponse(rows, content_type='application/x-ndjson')
+
+
+@csrf_exempt
+@require_POST
+async def calculate_hecm_batch_async(request):
+    """
+    Async variant of calculate_hecm_batch for ASGI deployments
+
+    Rows are computed on the event loop when the quote cache is disabled or
+    in-process, and in a worker thread when it is a Django cache, whose
+    backend may do blocking I/O.
+    """
+    config = await HECMConfig.aget_current()
+    await aget_plf_index(config)
+    in_process = quote_cache_in_process()
+
+    async def rows():
+        for index, scenario in _iter_scenarios(request):
+            if in_process:
+                yield _batch_row(index, scenario, config, view='calculate_batch_async')
+            else:
+                yield await sync_to_async(_batch_row)(index, scenario, config, view='calculate_batch_async')
+
+    return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+
+
+@require_GET
+def hecm_metrics(request):
+    """
+    Expose the quote metrics in the Prometheus text format
+
+    Only clients listed in HECM_METRICS_ALLOWED_IPS may scrape it. The
+    metrics are per process, so each scrape sees the worker that served it.
+    """
+    allowed = getattr(settings, 'HECM_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')